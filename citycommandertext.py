@@ -1,103 +1,96 @@
 import streamlit as st
-import pandas as pd
-import docx
-from io import BytesIO
-import re
-import base64
-from spellchecker import SpellChecker
+import os
+from college_export import college_profile, create_transposed_html_table, create_transposed_word_table, profile_content_hash
+from college_index import CollegeIndex
+from precorrect import load_precorrected, precorrected_path
+from template_store import load_template, template_hash
+from spell_engine import SpellEngine, build_domain_whitelist
 
-# Initialize SpellChecker
-spell = SpellChecker()
+SEARCH_RESULTS = 20  # Colleges offered in the dropdown for each search
 
-# Function to convert text to proper case, ignoring abbreviations
-def proper_case_except_abbreviations(text):
-    def capitalize_word(word):
-        if word.isupper():  # Keep abbreviations in uppercase
-            return word
-        else:
-            return word.capitalize()  # Capitalize only non-abbreviation words
-    return ' '.join([capitalize_word(word) for word in re.split(r'(\W+)', text)])
+# Function to load the predefined Excel file (bundled copy, served from the local columnar cache)
+# with a lookup index over the college names; both are built once and shared by all sessions, so they are never modified
+@st.cache_resource(show_spinner=False)
+def load_college_table():
+    df = load_template()
+    df['College Display'] = df['College Name'] + " (Fields Filled: " + df['Filled Fields Count'].astype(str) + ")"
+    return df, CollegeIndex(df['College Name'])
 
-# Function to correct spelling mistakes using pyspellchecker and clean text
-def correct_text(text):
-    if isinstance(text, str):
-        words = text.split()
-        corrected_words = [spell.correction(word) if word not in spell else word for word in words]
-        corrected_text = ' '.join(corrected_words)
-        return proper_case_except_abbreviations(corrected_text)
-    return text
+# Function to build the spell engine once; the template's college names and acronyms are whitelisted
+@st.cache_resource(show_spinner=False)
+def get_spell_engine():
+    df, _ = load_college_table()
+    return SpellEngine(build_domain_whitelist(df))
 
-# Function to load the predefined Excel file from a local path or URL
-@st.cache_data
-def load_predefined_excel():
-    file_url = "https://raw.githubusercontent.com/nishit002/dekho-codes/main/ALL_CCM_ALL_Template.xlsx"
-    
-    try:
-        df = pd.read_excel(file_url, header=0)
-        df['College Name'] = df.iloc[:, 0].astype(str)
-        df = df.dropna(subset=['College Name'])
-        df['Filled Fields Count'] = df.notna().sum(axis=1) - 1  # Exclude the college name column
-        return df
-    except Exception as e:
-        st.error(f"Error loading file: {str(e)}")
+# Function to load the template corrected ahead of time by precorrect.py, reloaded whenever that file is rebuilt
+@st.cache_resource(max_entries=2, show_spinner=False)
+def load_precorrected_table(content_hash, built_at):
+    return load_precorrected(content_hash)
+
+# Function to get the pre-corrected template for the current template version, or None if the batch has not run for it
+def get_precorrected_table():
+    content_hash = template_hash()
+    path = precorrected_path(content_hash)
+    if not os.path.exists(path):
         return None
+    return load_precorrected_table(content_hash, os.path.getmtime(path))
 
-# Function to create a Word document with a transposed table (with borders)
-def create_transposed_word_table(college_data):
-    doc = docx.Document()
-    doc.add_heading('College Details', 0)
-    
-    table = doc.add_table(rows=len(college_data.columns), cols=2)  # Transpose: Rows = number of columns in original data
-    table.style = 'Table Grid'
-    
-    for i, col in enumerate(college_data.columns):
-        table.rows[i].cells[0].text = col
-        table.rows[i].cells[1].text = str(college_data[col].values[0])
-    
-    buffer = BytesIO()
-    doc.save(buffer)
-    buffer.seek(0)
-    return buffer
+ARTIFACT_CACHE_ENTRIES = 64  # Profiles whose Word and HTML files stay memoized
 
-# Function to create a transposed HTML table
-def create_transposed_html_table(college_data):
-    transposed_df = college_data.T
-    html_table = transposed_df.to_html(header=False, border=1)
-    return html_table
+# Function to build the Word and HTML files of a profile once per college and content
+# (the profile frame itself is not hashed; its content hash stands in for it)
+@st.cache_data(max_entries=ARTIFACT_CACHE_ENTRIES, show_spinner=False)
+def build_profile_artifacts(college_name, content_hash, _college_data):
+    return create_transposed_word_table(_college_data).getvalue(), create_transposed_html_table(_college_data)
 
 # Streamlit app
 st.title('College Information Table Generator with Faster Spell Correction')
 
 # Load the predefined Excel file automatically
 st.write("Loading predefined Excel file...")
-processed_df = load_predefined_excel()
+try:
+    processed_df, college_index = load_college_table()
+except Exception as e:
+    st.error(f"Error loading file: {str(e)}")
+    processed_df = None
 
 if processed_df is not None:
-    processed_df['College Display'] = processed_df['College Name'] + " (Fields Filled: " + processed_df['Filled Fields Count'].astype(str) + ")"
-    
-    college_list = processed_df['College Display'].tolist()
-    selected_college = st.selectbox("Select a college", college_list)
+    # Only the top matches of the search reach the browser, not the whole college list
+    search_text = st.text_input("Search for a college", placeholder="Type part of the college name")
+    matches = college_index.search(search_text, k=SEARCH_RESULTS)
+    if not matches:
+        st.info("No colleges match your search.")
+    selected_position = st.selectbox("Select a college", matches, format_func=lambda position: processed_df['College Display'].iat[position])
 
-    if selected_college:
+    if selected_position is not None:
+        selected_college = processed_df['College Display'].iat[selected_position]
         st.write(f"Details for {selected_college}:")
         
-        college_data = processed_df[processed_df['College Display'] == selected_college].drop(columns=['College Display', 'Filled Fields Count'])
-        college_data = college_data.loc[:, college_data.notna().any()]
+        college_data = college_profile(processed_df, selected_position)
         
         st.dataframe(college_data.T)
         
+        # The correction is remembered for the selected college, so it survives the "Prepare Downloads" rerun
         if st.button('Correct Spelling and Grammar'):
-            college_data = college_data.applymap(lambda x: correct_text(x) if isinstance(x, str) else x)
+            st.session_state['corrected_college'] = selected_college
+        if st.session_state.get('corrected_college') == selected_college:
+            precorrected_df = get_precorrected_table()
+            if precorrected_df is not None:
+                # Served from the batch run (python precorrect.py), with the columns shown above
+                college_data = precorrected_df.iloc[[selected_position]][college_data.columns]
+            else:
+                college_data = get_spell_engine().correct_frame(college_data)
             st.write("Corrected Data:")
             st.dataframe(college_data.T)
         
-        buffer_word = create_transposed_word_table(college_data)
-        st.download_button(label="Download College Data as Word", data=buffer_word, file_name=f"{selected_college}.docx", mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document")
-        
-        html_table = create_transposed_html_table(college_data)
-        b64_html = base64.b64encode(html_table.encode()).decode()
-        href_html = f'<a href="data:text/html;base64,{b64_html}" download="{selected_college}.html">Download College Data as HTML</a>'
-        st.markdown(href_html, unsafe_allow_html=True)
-        
-        st.text_area("HTML Table (Copy this):", value=html_table, height=200)
+        # Word and HTML files are built only when asked for, then reused while the profile is unchanged
+        content_hash = profile_content_hash(college_data)
+        if st.button("Prepare Downloads"):
+            st.session_state['prepared_downloads'] = (selected_college, content_hash)
+
+        if st.session_state.get('prepared_downloads') == (selected_college, content_hash):
+            word_bytes, html_table = build_profile_artifacts(selected_college, content_hash, college_data)
+            st.download_button(label="Download College Data as Word", data=word_bytes, file_name=f"{selected_college}.docx", mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+            st.download_button(label="Download College Data as HTML", data=html_table, file_name=f"{selected_college}.html", mime="text/html")
+            st.text_area("HTML Table (Copy this):", value=html_table, height=200)
 
@@ -0,0 +1,119 @@
+import hashlib
+import itertools
+import multiprocessing
+import os
+import re
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import docx
+
+from template_store import load_template
+
+EXPORT_WORKERS = min(4, os.cpu_count() or 1)
+EXPORT_CHUNK_ROWS = 25  # Profiles built per worker task
+DERIVED_COLUMNS = ['College Display', 'Filled Fields Count']  # Page-only columns left out of the profiles
+
+
+# Function to create a Word document with a transposed table (with borders)
+def create_transposed_word_table(college_data):
+    doc = docx.Document()
+    doc.add_heading('College Details', 0)
+
+    table = doc.add_table(rows=len(college_data.columns), cols=2)  # Transpose: Rows = number of columns in original data
+    table.style = 'Table Grid'
+
+    for i, col in enumerate(college_data.columns):
+        table.rows[i].cells[0].text = col
+        table.rows[i].cells[1].text = str(college_data[col].values[0])
+
+    buffer = BytesIO()
+    doc.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+# Function to create a transposed HTML table
+def create_transposed_html_table(college_data):
+    transposed_df = college_data.T
+    html_table = transposed_df.to_html(header=False, border=1)
+    return html_table
+
+
+# Function to get one college's profile as the page shows it: a single row without blank or derived columns
+# The row is returned as plain objects so per-cell functions never run over a categorical column's other values
+def college_profile(df, position):
+    college_data = df.iloc[[position]].drop(columns=DERIVED_COLUMNS, errors='ignore')
+    return college_data.loc[:, college_data.notna().any()].astype(object)
+
+
+# Function to hash the content of a profile, so files built from it can be reused until it changes
+def profile_content_hash(college_data):
+    digest = hashlib.sha256()
+    for col in college_data.columns:
+        digest.update(f"{col}\x1f{college_data[col].values[0]}\x1e".encode())
+    return digest.hexdigest()
+
+
+# Function to turn a college name into a safe, unique file name stem inside the zip
+def profile_file_stem(position, college_name):
+    name = re.sub(r'[^0-9A-Za-z]+', '_', str(college_name)).strip('_')[:80] or 'college'
+    return f"{position:05d}_{name}"
+
+
+_worker_table = None  # Template loaded once per worker process
+
+
+def _init_export_worker():
+    global _worker_table
+    _worker_table = load_template()  # Read from the Feather cache, so no worker parses the workbook
+
+
+# Function run in the workers: build the Word and HTML files of a chunk of rows as (zip path, bytes) pairs
+def _export_chunk(positions):
+    files = []
+    for position in positions:
+        college_data = college_profile(_worker_table, position)
+        stem = profile_file_stem(position, _worker_table['College Name'].iat[position])
+        files.append((f"docx/{stem}.docx", create_transposed_word_table(college_data).getvalue()))
+        files.append((f"html/{stem}.html", create_transposed_html_table(college_data).encode()))
+    return files
+
+
+# Function to export the profiles of the given rows (all rows if None) into a zip file on disk
+# Only a few chunks are in flight at a time and each is written as soon as it is ready, so memory stays bounded
+def export_profiles_zip(output_path, positions=None, max_workers=EXPORT_WORKERS, on_progress=None):
+    if positions is None:
+        positions = range(len(load_template()))
+    positions = list(positions)
+    chunks = [positions[i:i + EXPORT_CHUNK_ROWS] for i in range(len(positions))[::EXPORT_CHUNK_ROWS]]
+
+    done = 0
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_export_worker,
+    ) as executor, zipfile.ZipFile(output_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        chunk_iter = iter(chunks)
+        pending = deque((len(chunk), executor.submit(_export_chunk, chunk)) for chunk in itertools.islice(chunk_iter, max_workers * 2))
+        while pending:
+            rows, future = pending.popleft()
+            for arcname, data in future.result():
+                # Word files are zip archives already, so deflating them again only costs time
+                archive.writestr(arcname, data, compress_type=zipfile.ZIP_STORED if arcname.endswith(".docx") else None)
+            done += rows
+            if on_progress:
+                on_progress(done, len(positions))
+            chunk = next(chunk_iter, None)
+            if chunk is not None:
+                pending.append((len(chunk), executor.submit(_export_chunk, chunk)))
+    return output_path
+
+
+# Background job: export the profiles of the given rows into the job's own zip file
+def run_export_job(job, positions):
+    total = len(load_template()) if positions is None else len(positions)
+    job.report_progress(0, total)
+    return export_profiles_zip(job.result_path("college_profiles.zip"), positions, on_progress=job.report_progress)
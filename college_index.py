@@ -0,0 +1,84 @@
+import bisect
+import heapq
+import re
+from collections import Counter, defaultdict
+
+NGRAM_SIZE = 3
+MIN_NGRAM_OVERLAP = 0.3  # Share of the query's n-grams a name must contain to count as a match
+
+
+# Function to normalize a college name for lookups: lowercase, punctuation and extra spaces removed
+def normalize_name(name):
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", str(name).lower()).split())
+
+
+# Function to split a normalized name into character n-grams, padded so word starts and ends count
+def name_ngrams(normalized):
+    padded = f" {normalized} "
+    return {padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1)}
+
+
+# Lookup index over a fixed list of college names; positions refer to rows of the indexed table
+class CollegeIndex:
+    def __init__(self, names):
+        self.names = list(names)
+        self.normalized = [normalize_name(name) for name in self.names]
+        self.exact = defaultdict(list)  # Normalized name -> positions (names can repeat)
+        self.grams = defaultdict(list)  # N-gram -> positions of names containing it
+        for position, normalized in enumerate(self.normalized):
+            self.exact[normalized].append(position)
+            for gram in name_ngrams(normalized):
+                self.grams[gram].append(position)
+        # Sorted normalized names for prefix scans with bisect
+        self.sorted_names = sorted((normalized, position) for position, normalized in enumerate(self.normalized))
+        self.sorted_keys = [normalized for normalized, _ in self.sorted_names]
+
+    # Function to get the positions of a name, ignoring case and punctuation
+    def lookup(self, name):
+        return list(self.exact.get(normalize_name(name), ()))
+
+    # Function to get the positions of every name containing the text (all names for an empty text)
+    def contains(self, text):
+        text = normalize_name(text)
+        return [position for position, normalized in enumerate(self.normalized) if text in normalized]
+
+    # Function to get the positions of names starting with a normalized prefix, in name order
+    def prefix_matches(self, prefix, k):
+        start = bisect.bisect_left(self.sorted_keys, prefix)
+        matches = []
+        for normalized, position in self.sorted_names[start:start + k]:
+            if not normalized.startswith(prefix):
+                break
+            matches.append(position)
+        return matches
+
+    # Function to get the positions of the top k names for a search text:
+    # exact matches first, then names starting with the text, then names sharing the most n-grams
+    def search(self, query, k=20):
+        query = normalize_name(query)
+        if not query:
+            return list(range(min(k, len(self.names))))
+
+        results = list(self.exact.get(query, ()))[:k]
+        seen = set(results)
+        for position in self.prefix_matches(query, k):
+            if len(results) >= k:
+                return results
+            if position not in seen:
+                results.append(position)
+                seen.add(position)
+
+        query_grams = name_ngrams(query)
+        if len(results) >= k or len(query) < NGRAM_SIZE:
+            return results
+        shared = Counter()
+        for gram in query_grams:
+            shared.update(self.grams.get(gram, ()))
+        min_shared = max(1, MIN_NGRAM_OVERLAP * len(query_grams))
+        candidates = [
+            (-count, len(self.names[position]), position)
+            for position, count in shared.items()
+            if count >= min_shared and position not in seen
+        ]
+        results.extend(position for _, _, position in heapq.nsmallest(k - len(results), candidates))
+        return results
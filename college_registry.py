@@ -0,0 +1,293 @@
+import argparse
+import functools
+import os
+import pickle
+import sqlite3
+import threading
+
+import pandas as pd
+from fuzzywuzzy import fuzz
+
+from college_index import normalize_name
+from name_matching import DEFAULT_TOP_K, NameMatcher
+
+DEFAULT_REGISTRY_PATH = os.path.join(".cache", "college_registry.sqlite")
+DEFAULT_SUGGEST_THRESHOLD = 92  # Minimum token_sort_ratio for an unseen name to be suggested as a spelling of a college
+MIN_TYPO_TOKEN_LENGTH = 5  # Shorter tokens (IIT, NIT, BHU, city codes, numbers) must match exactly
+MIN_TYPO_TOKEN_RATIO = 85  # Similarity for a longer token to count as a misspelling of another
+
+
+# Function to build the alias key of a name: normalized, with dots dropped so "I.I.T." and "IIT" agree
+def alias_key(name):
+    return normalize_name(name.replace(".", ""))
+
+
+# Function to tell whether two tokens are the same word, allowing typos only in longer words
+def same_token(token_a, token_b):
+    if token_a == token_b:
+        return True
+    if min(len(token_a), len(token_b)) < MIN_TYPO_TOKEN_LENGTH or token_a.isdigit() or token_b.isdigit():
+        return False
+    return fuzz.ratio(token_a, token_b) >= MIN_TYPO_TOKEN_RATIO
+
+
+# Function to tell whether two names may be spellings of the same college, to suggest (never apply) a merge:
+# similar overall, and every word of each name has a counterpart in the other, so institute types
+# (IIT vs IIIT), locations (Pune vs Surat) and campus tags (BHU) cannot differ
+def same_college(name_a, name_b, threshold):
+    tokens_a, tokens_b = alias_key(name_a).split(), alias_key(name_b).split()
+    if not all(any(same_token(a, b) for b in tokens_b) for a in tokens_a):
+        return False
+    if not all(any(same_token(b, a) for a in tokens_a) for b in tokens_b):
+        return False
+    return fuzz.token_sort_ratio(name_a, name_b) >= threshold
+
+
+# Canonical colleges with stable integer IDs and every spelling (alias) seen for them
+# Only exact alias matches resolve automatically; similar names are recorded as suggestions for someone to confirm.
+# Pages that only display data use lookup(), which never writes to the registry
+class CollegeRegistry:
+    def __init__(self, path=DEFAULT_REGISTRY_PATH, suggest_threshold=DEFAULT_SUGGEST_THRESHOLD):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.index_path = os.path.splitext(path)[0] + "_index.pkl"
+        self.suggest_threshold = suggest_threshold
+        self.lock = threading.Lock()
+        self.matcher = None  # Fuzzy index over the canonical names, built when first needed
+        self.provisional = {}  # Alias key -> negative ID, for names looked up but not registered (this process only)
+        self.provisional_names = {}
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS colleges (college_id INTEGER PRIMARY KEY, name TEXT NOT NULL)")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS aliases (alias TEXT PRIMARY KEY, college_id INTEGER NOT NULL REFERENCES colleges)"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS suggestions (alias TEXT PRIMARY KEY, college_id INTEGER NOT NULL, "
+                "score INTEGER NOT NULL, status TEXT NOT NULL DEFAULT 'pending')"
+            )
+            self.reload()
+
+    # Function to get the registry's generation, bumped by every change (lets caches built from IDs notice changes)
+    def generation(self):
+        return self.conn.execute("PRAGMA user_version").fetchone()[0]
+
+    # Function to read the registry into memory
+    def reload(self):
+        self.loaded_generation = self.generation()
+        self.names = dict(self.conn.execute("SELECT college_id, name FROM colleges"))
+        self.aliases = dict(self.conn.execute("SELECT alias, college_id FROM aliases"))
+
+    # Function to pick up changes made by other processes (e.g. confirmed suggestions)
+    def refresh(self):
+        if self.generation() != self.loaded_generation:
+            self.reload()
+
+    # Function to run a write transaction; the generation is bumped so readers and caches see the change
+    def write(self, statements):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.reload()
+            result = statements()
+            self.conn.execute(f"PRAGMA user_version = {self.generation() + 1}")
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        finally:
+            self.reload()
+        return result
+
+    # Function to get the fuzzy index over the canonical names, loading the serialized one when it is current
+    def get_matcher(self):
+        college_ids = sorted(self.names)
+        if self.matcher is not None and self.matcher_ids == college_ids:
+            return self.matcher
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "rb") as f:
+                matcher_ids, matcher = pickle.load(f)
+            if matcher_ids == college_ids:
+                self.matcher_ids, self.matcher = matcher_ids, matcher
+                return self.matcher
+        self.matcher_ids = college_ids
+        self.matcher = NameMatcher([self.names[college_id] for college_id in self.matcher_ids])
+        tmp_file = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_file, "wb") as f:
+            pickle.dump((self.matcher_ids, self.matcher), f)
+        os.replace(tmp_file, self.index_path)
+        return self.matcher
+
+    # Function to find registered colleges similar to unseen names: alias -> (college ID, score) worth suggesting
+    def suggest_existing(self, unseen):
+        if not unseen or not self.names:
+            return {}
+        matcher = self.get_matcher()
+        suggestions = {}
+        for alias, (index, score, _) in zip(unseen, matcher.match(list(unseen.values()))):
+            if index is not None and same_college(unseen[alias], matcher.names[index], self.suggest_threshold):
+                suggestions[alias] = (self.matcher_ids[index], score)
+        return suggestions
+
+    # Function to find, for names new in the same batch, an earlier one of them they may be a spelling of
+    def suggest_within_batch(self, unseen, new_aliases):
+        batch = list(unseen)
+        batch_matcher = NameMatcher([unseen[alias] for alias in batch])
+        step = batch_matcher.chunk_rows()
+        suggestions = {}
+        for i, alias in enumerate(batch):
+            if i % step == 0:
+                candidates, _ = batch_matcher.top_candidates(batch_matcher.names[i:i + step], k=DEFAULT_TOP_K)
+            for j in sorted(j for j in candidates[i % step] if j < i):
+                if same_college(unseen[alias], unseen[batch[j]], self.suggest_threshold):
+                    suggestions[alias] = (new_aliases[batch[j]], fuzz.token_sort_ratio(unseen[alias], unseen[batch[j]]))
+                    break
+        return suggestions
+
+    # Function to register names: exact alias matches reuse their college, any other name becomes a new college,
+    # and new names similar to another college are recorded as suggestions. Returns an Int64 Series of IDs
+    def register(self, names):
+        names = pd.Series(names)
+        keys = names.map(lambda name: alias_key(name) if isinstance(name, str) else None)
+        spellings = {}
+        for key, name in zip(keys, names):
+            if isinstance(key, str) and key and key not in spellings:
+                spellings[key] = " ".join(name.split())
+
+        def statements():
+            unseen = {alias: name for alias, name in spellings.items() if alias not in self.aliases}
+            if not unseen:
+                return
+            suggestions = self.suggest_existing(unseen)
+            new_aliases = {}
+            for alias, name in unseen.items():
+                cursor = self.conn.execute("INSERT INTO colleges (name) VALUES (?)", (name,))
+                new_aliases[alias] = cursor.lastrowid
+            self.conn.executemany("INSERT INTO aliases (alias, college_id) VALUES (?, ?)", new_aliases.items())
+            for alias, suggestion in self.suggest_within_batch(unseen, new_aliases).items():
+                suggestions.setdefault(alias, suggestion)
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO suggestions (alias, college_id, score) VALUES (?, ?, ?)",
+                [(alias, college_id, score) for alias, (college_id, score) in suggestions.items()],
+            )
+
+        with self.lock:
+            if any(alias not in self.aliases for alias in spellings):
+                self.write(statements)
+            return keys.map(self.aliases).astype("Int64")
+
+    # Function to look up college IDs without changing the registry: known spellings get their college's ID,
+    # unknown ones a provisional negative ID (the same for the same alias key, in this process only)
+    # Returns an Int64 Series aligned with the input (missing names stay missing)
+    def lookup(self, names):
+        names = pd.Series(names)
+        keys = names.map(lambda name: alias_key(name) if isinstance(name, str) else None)
+        with self.lock:
+            self.refresh()
+            for key, name in zip(keys, names):
+                if isinstance(key, str) and key and key not in self.aliases and key not in self.provisional:
+                    self.provisional[key] = -(len(self.provisional) + 1)
+                    self.provisional_names[self.provisional[key]] = " ".join(name.split())
+            return keys.map(lambda key: self.aliases.get(key, self.provisional.get(key))).astype("Int64")
+
+    # Function to record spellings of known colleges as (alias name, canonical name) pairs, e.g. accepted mapper matches
+    # Canonical names not in the registry yet are registered first; aliases already known keep their college
+    def add_aliases(self, pairs):
+        pairs = [(alias_name, canonical_name) for alias_name, canonical_name in pairs if alias_key(alias_name)]
+        college_ids = self.register([canonical_name for _, canonical_name in pairs])
+        with self.lock:
+            new_aliases = {}
+            for (alias_name, _), college_id in zip(pairs, college_ids):
+                alias = alias_key(alias_name)
+                if alias not in self.aliases and not pd.isna(college_id):
+                    new_aliases.setdefault(alias, int(college_id))
+            if new_aliases:
+                self.write(lambda: self.conn.executemany(
+                    "INSERT OR IGNORE INTO aliases (alias, college_id) VALUES (?, ?)", new_aliases.items()
+                ))
+        return len(new_aliases)
+
+    # Function to list the pending suggestions: the alias's current college and the college it may belong to
+    def pending_suggestions(self):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT s.alias, a.college_id, s.college_id, s.score FROM suggestions s "
+                "JOIN aliases a ON a.alias = s.alias WHERE s.status = 'pending' ORDER BY s.score DESC"
+            ).fetchall()
+        suggestions = pd.DataFrame(rows, columns=['Alias', 'College ID', 'Suggested College ID', 'Score'])
+        suggestions.insert(2, 'College Name', suggestions['College ID'].map(self.names))
+        suggestions['Suggested College Name'] = suggestions['Suggested College ID'].map(self.names)
+        return suggestions
+
+    # Function to accept a suggestion: the alias's college is merged into the suggested one (all its aliases move)
+    def confirm_suggestion(self, alias):
+        def statements():
+            row = self.conn.execute(
+                "SELECT college_id FROM suggestions WHERE alias = ? AND status = 'pending'", (alias,)
+            ).fetchone()
+            if row is None:
+                raise KeyError(f"No pending suggestion for {alias!r}")
+            college_id, into_id = self.aliases[alias], row[0]
+            if college_id != into_id:
+                self.conn.execute("UPDATE aliases SET college_id = ? WHERE college_id = ?", (into_id, college_id))
+                self.conn.execute("UPDATE suggestions SET college_id = ? WHERE college_id = ?", (into_id, college_id))
+                self.conn.execute("DELETE FROM colleges WHERE college_id = ?", (college_id,))
+            self.conn.execute("UPDATE suggestions SET status = 'confirmed' WHERE alias = ?", (alias,))
+
+        with self.lock:
+            self.write(statements)
+
+    # Function to reject a suggestion, so the alias stays its own college and is not suggested again
+    def reject_suggestion(self, alias):
+        with self.lock:
+            self.write(lambda: self.conn.execute("UPDATE suggestions SET status = 'rejected' WHERE alias = ?", (alias,)))
+
+    # Function to get the canonical name of a college ID (or the spelling behind a provisional ID)
+    def name(self, college_id):
+        college_id = int(college_id)
+        return self.names.get(college_id) if college_id > 0 else self.provisional_names.get(college_id)
+
+    # Function to map a Series of college IDs to canonical names
+    def names_for(self, college_ids):
+        return pd.Series(college_ids).astype("Int64").map(lambda college_id: None if pd.isna(college_id) else self.name(college_id))
+
+
+# Function to open the registry once per path and share it across Streamlit reruns and sessions
+@functools.lru_cache(maxsize=None)
+def open_registry(path=DEFAULT_REGISTRY_PATH):
+    return CollegeRegistry(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the canonical college registry.")
+    parser.add_argument("--registry", default=DEFAULT_REGISTRY_PATH, help="Registry database")
+    commands = parser.add_subparsers(dest="command", required=True)
+    register_parser = commands.add_parser("register", help="Register the college names of a CSV or Excel file")
+    register_parser.add_argument("file")
+    register_parser.add_argument("--column", default="College Name", help="College name column")
+    commands.add_parser("suggestions", help="List the pending merge suggestions")
+    confirm_parser = commands.add_parser("confirm", help="Merge aliases into their suggested colleges")
+    confirm_parser.add_argument("aliases", nargs="+")
+    reject_parser = commands.add_parser("reject", help="Reject merge suggestions")
+    reject_parser.add_argument("aliases", nargs="+")
+    args = parser.parse_args()
+
+    registry = CollegeRegistry(args.registry)
+    if args.command == "register":
+        read = pd.read_csv if args.file.lower().endswith(".csv") else pd.read_excel
+        ids = registry.register(read(args.file)[args.column])
+        print(f"{ids.nunique()} colleges; {len(registry.pending_suggestions())} pending suggestions")
+    elif args.command == "suggestions":
+        print(registry.pending_suggestions().to_string(index=False))
+    elif args.command == "confirm":
+        for alias in args.aliases:
+            registry.confirm_suggestion(alias)
+        print(f"Confirmed {len(args.aliases)} suggestions")
+    else:
+        for alias in args.aliases:
+            registry.reject_suggestion(alias)
+        print(f"Rejected {len(args.aliases)} suggestions")
+
+
+if __name__ == "__main__":
+    main()
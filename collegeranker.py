@@ -3,6 +3,7 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from io import BytesIO
 from docx import Document
+from college_registry import open_registry
 
 # Title of the app
 st.title("College Ranking Analysis Tool")
@@ -20,13 +21,19 @@ if uploaded_file:
     # Ensure consistent column names (strip spaces)
     data.columns = data.columns.str.strip()
 
+    # Look up college names in the registry (read-only), so every known spelling of a college pivots into the same row
+    registry = open_registry()
+    data["College ID"] = registry.lookup(data["College Name"]).to_numpy()
+
     # Pivot data to create year-wise ranking columns
     pivot_data = data.pivot_table(
-        index=["College Name", "City_name", "Stream", "Agency Name", "college_type"],
+        index=["College ID", "City_name", "Stream", "Agency Name", "college_type"],
         columns="year",
         values="end_ranking_of_college",
         aggfunc="first"
     ).reset_index()
+    # Show the canonical college name in place of the ID
+    pivot_data.insert(0, "College Name", registry.names_for(pivot_data.pop("College ID")).to_numpy())
     pivot_data.columns = [str(col) if isinstance(col, int) else col for col in pivot_data.columns]
 
     st.write("### Pivoted Data with Year-Wise Rankings")
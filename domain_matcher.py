@@ -0,0 +1,73 @@
+import functools
+from urllib.parse import urlparse
+
+# Multi-label public suffixes seen in our SERPs; any other TLD is treated as a single label
+MULTI_LABEL_SUFFIXES = {
+    "ac.in", "co.in", "edu.in", "ernet.in", "gen.in", "gov.in", "ind.in", "net.in", "nic.in", "org.in", "res.in",
+    "ac.uk", "co.uk", "gov.uk", "org.uk",
+    "com.au", "edu.au", "net.au", "org.au",
+    "ac.nz", "co.nz",
+    "com.sg", "edu.sg",
+    "com.my", "edu.my",
+    "ac.jp", "co.jp",
+    "ac.za", "co.za",
+    "com.bd", "edu.bd",
+    "com.np", "edu.np",
+    "com.pk", "edu.pk",
+    "com.cn", "edu.cn",
+    "com.br",
+    "ac.ae", "co.ae",
+}
+
+
+# Function to reduce a URL or bare domain to a lowercase host without scheme, port or "www."
+def normalize_host(url):
+    url = str(url).strip().lower()
+    if "://" not in url and not url.startswith("//"):
+        url = "//" + url  # Let urlparse treat bare domains as the network location
+    try:
+        host = urlparse(url).hostname or ""
+    except ValueError:  # Malformed URLs (e.g. broken IPv6 literals) never match
+        return ""
+    host = host.rstrip(".")
+    if host.startswith("www."):
+        host = host[4:]
+    return host
+
+
+# Function to get the registrable domain (e.g. "shiksha.com", "iitd.ac.in") of a host
+def registrable_domain(host):
+    labels = host.split(".")
+    if len(labels) >= 3 and ".".join(labels[-2:]) in MULTI_LABEL_SUFFIXES:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+# Hash index of tracked domains; each lookup walks only the host's own labels,
+# so the cost per result does not grow with the number of tracked domains
+class DomainMatcher:
+    def __init__(self, tracked_domains):
+        self.index = {}  # Normalized host -> tracked labels as the caller spelled them
+        for label in tracked_domains:
+            host = normalize_host(label)
+            if host:
+                self.index.setdefault(host, []).append(label)
+
+    # Function to return every tracked label the URL belongs to, most specific first
+    def match(self, url):
+        host = normalize_host(url)
+        if not host:
+            return []
+        stop = registrable_domain(host)
+        matches = []
+        while True:
+            matches.extend(self.index.get(host, ()))
+            if host == stop or "." not in host:
+                return matches
+            host = host.split(".", 1)[1]
+
+
+# Function to get a matcher for a fixed set of domains, built once and reused across calls
+@functools.lru_cache(maxsize=128)
+def get_matcher(tracked_domains):
+    return DomainMatcher(tracked_domains)
@@ -1,101 +1,167 @@
 import streamlit as st
 from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.firefox.service import Service as FirefoxService
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
 from webdriver_manager.firefox import GeckoDriverManager
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote_plus
 import pandas as pd
-import time
-import os
+import queue
+import threading
+from domain_matcher import get_matcher
+from job_runner import show_jobs, submit_job
 
 # Competitors to track
 primary_site = "collegedekho.com"
 competitors = ["collegedunia.com", "shiksha.com", "getmyuni.com", "careers360.com"]
-
-# Global variables
-results_file_path = "serp_results.xlsx"
-scraping_in_progress = False
-start_time = None
-
-# Function to perform Google SERP scraping using Firefox and Geckodriver
-def scrape_google_serp(keywords):
-    global scraping_in_progress, results_file_path
-
-    # Set up Selenium WebDriver with Firefox
+primary_matcher = get_matcher((primary_site,))
+competitor_matcher = get_matcher(tuple(competitors))
+
+# Default name of the results workbook; each background job writes its own copy
+results_file_name = "serp_results.xlsx"
+
+RESULTS_TIMEOUT = 15  # Seconds to wait for the results container before giving up on a keyword
+MAX_RESULTS = 10  # Limit to top 10 results
+
+# Pulls rank, title and URL for every result in one WebDriver roundtrip
+# Results missing a heading or link are returned with an error instead of being dropped
+EXTRACT_RESULTS_JS = """
+return Array.from(document.querySelectorAll('div.g')).slice(0, arguments[0]).map(function (result, idx) {
+    var heading = result.querySelector('h3');
+    var link = result.querySelector('a[href]');
+    var error = null;
+    if (!heading) {
+        error = 'missing h3 title';
+    } else if (!link) {
+        error = 'missing result link';
+    }
+    return {
+        rank: idx + 1,
+        title: heading ? heading.innerText : null,
+        url: link ? link.href : null,
+        error: error
+    };
+});
+"""
+
+# Function to build lean headless Firefox options (no images, CSS or web fonts)
+def build_firefox_options():
     options = webdriver.FirefoxOptions()
     options.add_argument('--headless')
-    
-    driver = webdriver.Firefox(service=FirefoxService(GeckoDriverManager().install()), options=options)
-
-    data = []
-
-    # Loop through each keyword
-    for keyword in keywords:
-        driver.get("https://www.google.com")
-        search_box = driver.find_element("name", "q")
-        search_box.clear()
-        search_box.send_keys(keyword)
-        search_box.send_keys(u'\ue007')  # Press Enter (Google Search)
-        time.sleep(2)  # Wait for the results page to load
-
-        # Fetch results and analyze rankings for primary site and competitors
-        search_results = driver.find_elements("css selector", 'div.g')
-        for idx, result in enumerate(search_results[:10]):  # Limit to top 10 results
-            try:
-                title = result.find_element("tag name", 'h3').text
-                url = result.find_element("tag name", 'a').get_attribute('href')
-                rank = idx + 1
-                is_primary = primary_site in url
-                is_competitor = any(comp in url for comp in competitors)
-                data.append({
-                    'Keyword': keyword,
-                    'Rank': rank,
-                    'Title': title,
-                    'URL': url,
-                    'Is Primary': is_primary,
-                    'Is Competitor': is_competitor
-                })
-            except:
-                continue
-
-    driver.quit()
-
-    # Convert to DataFrame and save as Excel
+    options.set_preference("permissions.default.image", 2)
+    options.set_preference("permissions.default.stylesheet", 2)
+    options.set_preference("browser.display.use_document_fonts", 0)
+    options.set_preference("gfx.downloadable_fonts.enabled", False)
+    return options
+
+# Function to scrape one keyword on an already running driver, returning (rows, errors)
+def scrape_keyword(driver, keyword):
+    # Load the results page directly and wait for the results container instead of sleeping
+    driver.get(f"https://www.google.com/search?q={quote_plus(str(keyword))}")
+    WebDriverWait(driver, RESULTS_TIMEOUT).until(EC.presence_of_element_located(("css selector", "div#search")))
+
+    # Fetch results in a single script execution and analyze rankings for primary site and competitors
+    rows = []
+    errors = []
+    for result in driver.execute_script(EXTRACT_RESULTS_JS, MAX_RESULTS):
+        if result['error']:
+            errors.append({'Keyword': keyword, 'Rank': result['rank'], 'Error': result['error']})
+            continue
+        url = result['url']
+        rows.append({
+            'Keyword': keyword,
+            'Rank': result['rank'],
+            'Title': result['title'],
+            'URL': url,
+            'Is Primary': bool(primary_matcher.match(url)),
+            'Is Competitor': bool(competitor_matcher.match(url))
+        })
+    return rows, errors
+
+# Function to perform Google SERP scraping using a pool of reusable Firefox drivers
+# on_progress(done, total) is called after every keyword
+def scrape_google_serp(keywords, output_path, pool_size=3, on_progress=None):
+    driver_path = GeckoDriverManager().install()  # Resolve geckodriver once for the whole pool
+    pending = queue.Queue()
+    for position, keyword in enumerate(keywords):
+        pending.put((position, keyword))
+    keyword_rows = [[] for _ in keywords]  # Rows per keyword, so the output keeps the input order
+    keyword_errors = [[] for _ in keywords]
+    progress_lock = threading.Lock()
+    done_count = [0]
+
+    def keyword_done():
+        if on_progress:
+            with progress_lock:
+                done_count[0] += 1
+                on_progress(done_count[0], len(keywords))
+
+    # Each worker owns one driver and keeps pulling keywords until the queue is empty
+    def worker():
+        driver = webdriver.Firefox(service=FirefoxService(driver_path), options=build_firefox_options())
+        try:
+            while True:
+                try:
+                    position, keyword = pending.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    keyword_rows[position], keyword_errors[position] = scrape_keyword(driver, keyword)
+                except TimeoutException:
+                    keyword_errors[position] = [{'Keyword': keyword, 'Rank': None, 'Error': 'results container did not load'}]
+                except WebDriverException as e:
+                    keyword_errors[position] = [{'Keyword': keyword, 'Rank': None, 'Error': e.msg or type(e).__name__}]
+                keyword_done()
+        finally:
+            driver.quit()
+
+    pool_size = max(1, min(pool_size, len(keywords)))
+    with ThreadPoolExecutor(max_workers=pool_size) as executor:
+        for future in [executor.submit(worker) for _ in range(pool_size)]:
+            future.result()  # Surface driver start-up failures
+
+    data = [row for rows in keyword_rows for row in rows]
+    errors = [error for rows in keyword_errors for error in rows]
+
+    # Convert to DataFrame and save as Excel, with per-result failures on their own sheet
     df = pd.DataFrame(data)
-    df.to_excel(results_file_path, index=False)
-    scraping_in_progress = False  # Mark scraping as complete
-
-# Function to check for existing results and return the download link
-def check_results_file():
-    if os.path.exists(results_file_path):
-        return True
-    return False
+    errors_df = pd.DataFrame(errors, columns=['Keyword', 'Rank', 'Error'])
+    with pd.ExcelWriter(output_path) as writer:
+        df.to_excel(writer, sheet_name='Results', index=False)
+        errors_df.to_excel(writer, sheet_name='Errors', index=False)
+    return errors_df
+
+# Background job entry point (see job_runner.JOB_TARGETS)
+def run_serp_job(job, keywords, pool_size):
+    output_path = job.result_path(results_file_name)
+    job.report_progress(0, len(keywords))
+    errors_df = scrape_google_serp(keywords, output_path, pool_size, on_progress=job.report_progress)
+    if not errors_df.empty:
+        job.report_progress(len(keywords), len(keywords),
+                            message=f"{len(errors_df)} results could not be extracted; see the 'Errors' sheet")
+    return output_path
 
 # Streamlit App UI
-st.title("Google SERP Scraper")
-
-# File uploader for keywords
-uploaded_file = st.file_uploader("Upload Keywords Excel File", type="xlsx")
-
-if uploaded_file:
-    keywords_df = pd.read_excel(uploaded_file)
-    keywords = keywords_df['Keyword'].tolist()
-
-    if st.button("Start Scraping") and not scraping_in_progress:
-        scraping_in_progress = True
-        start_time = time.time()
-
-        # Start background scraping process
-        st.write(f"Scraping started with {len(keywords)} keywords.")
-        with st.spinner("Scraping in progress... Please wait."):
-            scrape_google_serp(keywords)
-
-        st.success("Scraping completed!")
-
-# Show progress or results
-if scraping_in_progress:
-    st.warning("Scraping is currently in progress... Please check back later.")
-else:
-    if check_results_file():
-        st.success("Scraping completed. You can download the results below:")
-        st.download_button(label="Download Results", data=open(results_file_path, 'rb'), file_name="serp_results.xlsx")
-    else:
-        st.info("No scraping results found. Please start the scraping process.")
+def main():
+    st.title("Google SERP Scraper")
+
+    # File uploader for keywords
+    uploaded_file = st.file_uploader("Upload Keywords Excel File", type="xlsx")
+
+    if uploaded_file:
+        keywords_df = pd.read_excel(uploaded_file)
+        keywords = keywords_df['Keyword'].tolist()
+        pool_size = st.slider("Number of Browsers", min_value=1, max_value=8, value=3)
+
+        # Scrapes run in a background worker with their own result file, so sessions never overwrite each other
+        if st.button("Start Scraping"):
+            submit_job("googlerankingscraper", (keywords, pool_size), description=f"{uploaded_file.name} ({len(keywords)} keywords)")
+            st.success(f"Scraping queued with {len(keywords)} keywords. Track its progress below.")
+
+    # Show progress or results of every job
+    show_jobs("googlerankingscraper")
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,8 @@ from io import BytesIO
 from docx import Document
 from docx.shared import Inches
 import os
+from serp_cache import make_cache_key, open_cache
+from college_registry import open_registry
 
 # Extract the ranking name from the file name
 def extract_ranking_name(filename):
@@ -21,22 +23,29 @@ def process_excel_files(uploaded_files, ranking_names):
         df['Rank'] = df['Rank'].apply(lambda x: f"#{int(x)}" if pd.notna(x) and isinstance(x, (int, float)) else 'N/A')
         df['Ranking Stream'] = ranking_names[i]
         all_data = pd.concat([all_data, df], ignore_index=True)
+    # Registry IDs (looked up read-only), so a college spelled differently across ranking files is still one college
+    all_data['College ID'] = open_registry().lookup(all_data['College Name']).to_numpy()
     return all_data
 
-# Perform Google search for the IIRF 2023 ranking
-def google_search_college_ranking(college_name):
+# Perform Google search for the IIRF 2023 ranking, served from the shared SERP cache when possible
+def google_search_college_ranking(college_name, cache=None):
+    cache = cache or open_cache()
     query = f"{college_name} IIRF Ranking 2023"
-    result_text = ""
-    try:
-        search_results = search(query, stop=1, pause=2)
-        for result in search_results:
-            page = requests.get(result)
-            soup = BeautifulSoup(page.content, 'html.parser')
-            result_text = soup.get_text()
-            break
-    except Exception as e:
-        print(f"Error fetching data from Google: {e}")
-    return result_text
+
+    def fetch():
+        result_text = ""
+        try:
+            search_results = search(query, stop=1, pause=2)
+            for result in search_results:
+                page = requests.get(result)
+                soup = BeautifulSoup(page.content, 'html.parser')
+                result_text = soup.get_text()
+                break
+        except Exception as e:
+            print(f"Error fetching data from Google: {e}")
+        return result_text or None  # Empty results are not cached
+
+    return cache.get_or_fetch(make_cache_key("iirf_google", query), fetch) or ""
 
 # Generate the Word document report
 def create_word_report(college_name, paragraph, table_data, graph_bytes):
@@ -127,10 +136,12 @@ def main():
         ])
 
         if ranking_type == 'College-wise':
-            colleges = all_data['College Name'].dropna().unique()
-            selected_college = st.selectbox('Select a College', colleges)
-            if selected_college:
-                college_data = all_data[all_data['College Name'] == selected_college]
+            registry = open_registry()
+            college_ids = all_data['College ID'].dropna().unique()
+            selected_id = st.selectbox('Select a College', college_ids, format_func=registry.name)
+            if selected_id is not None:
+                selected_college = registry.name(selected_id)
+                college_data = all_data[all_data['College ID'] == selected_id]
                 st.write(college_data[['Ranking Stream', 'Rank', 'City', 'State']].sort_values(by='Rank'))
 
                 # Google Search for College Ranking Text
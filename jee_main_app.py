@@ -1,47 +1,57 @@
+import datetime
+import hashlib
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 from io import BytesIO
 from docx import Document
 from docx.shared import Inches
-
-# Function to merge the two dataframes based on common key columns and replace suffixes with actual year values
-def merge_dataframes(df1, df2, key_columns, year1, year2):
-    merged_df = pd.merge(df1, df2, on=key_columns, suffixes=(f'_{year1}', f'_{year2}'))
-    return merged_df
-
-# Function to standardize the dataframe column names and remove unnecessary columns
-def preprocess_dataframe(df):
-    # Remove unwanted columns (e.g., Unnamed columns)
-    df.dropna(axis=1, how='all', inplace=True)
-    df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
-    
-    df.rename(columns={
-        'Institute': 'College Name',
-        'Academic Program Name': 'Course Name',
-        'Quota': 'Quota',
-        'Seat Type': 'Seat Type',
-        'Gender': 'Gender',
-        'Opening Rank': 'Opening Rank',
-        'Closing Rank': 'Closing Rank'
-    }, inplace=True)
+from college_registry import open_registry
+from josaa_store import level_values, load_josaa, select
+from seat_predictor import SeatPredictor
+from rank_trends import build_long_table, compute_trends, infer_year_round, summarize_trends
+
+# Function to format the trend rows for display: no key IDs and whole-number ranks
+def format_trend_table(df):
+    df = df.reset_index().drop(columns=['College Name', 'College ID'], errors='ignore')
+    for col in ['Opening Rank', 'Closing Rank', 'Opening Rank Change', 'Closing Rank Change']:
+        df[col] = df[col].round().astype("Int64")
     return df
 
-# Function to create a Word document without "College Name"
-def create_word_file(df, fig, filename='Comparison_Report.docx'):
+# Function to describe each course's closing-rank trend in one sentence
+def trend_sentences(summary):
+    sentences = []
+    for (_, course, quota, seat_type, gender), row in summary.iterrows():
+        first_year, latest_year = int(row['First Year']), int(row['Latest Year'])
+        if first_year == latest_year:
+            sentences.append(f"{course} ({quota}, {seat_type}, {gender}): closing rank {row['Latest Closing Rank']:.0f} in {latest_year}.")
+            continue
+        sentence = (
+            f"{course} ({quota}, {seat_type}, {gender}): closing rank moved from {row['First Closing Rank']:.0f} in {first_year} "
+            f"to {row['Latest Closing Rank']:.0f} in {latest_year} ({row['Closing Rank % Change']:+.2f}%)"
+        )
+        # Volatility needs at least two year-over-year changes
+        if pd.notna(row['Closing Rank Volatility']):
+            sentence += f", with a year-over-year volatility of {row['Closing Rank Volatility']:.2f}%"
+        sentences.append(sentence + ".")
+    return sentences
+
+# Function to create a Word document without "College Name" or "College ID"
+def create_word_file(df, fig, sentences, filename='Comparison_Report.docx'):
     doc = Document()
     doc.add_heading('Comparison Report', level=1)
     doc.add_paragraph('Comparison of Opening and Closing Ranks:')
 
-    # Drop "College Name" before adding table to the Word document
-    df = df.drop(columns=['College Name'], errors='ignore')
-    
     # Add the DataFrame as a table in the Word document
     t = doc.add_table(df.shape[0]+1, df.shape[1])
     for j, column in enumerate(df.columns):
         t.cell(0, j).text = column
         for i, val in enumerate(df[column].values):
-            t.cell(i+1, j).text = str(val)
+            t.cell(i+1, j).text = '' if pd.isna(val) else str(val)
+
+    doc.add_paragraph('Closing Rank Trends:')
+    for sentence in sentences:
+        doc.add_paragraph(sentence, style='List Bullet')
 
     # Add the chart to the Word document
     doc.add_paragraph('Rank Changes Over Years:')
@@ -53,19 +63,17 @@ def create_word_file(df, fig, filename='Comparison_Report.docx'):
     doc.save(filename)
     return filename
 
-# Function to create a Plotly chart with watermark
-def create_plotly_chart(df, year1, year2):
-    # Exclude "College Name" from the chart
-    df = df.drop(columns=['College Name'], errors='ignore')
-    
-    fig = px.line(df, x='Course Name', y=[f'Opening Rank_{year1}', f'Opening Rank_{year2}'],
-                  color='Quota', line_dash='Gender', 
-                  hover_name='Course Name', markers=True,
+# Function to create a Plotly chart with watermark: closing rank by year, one line per course
+def create_plotly_chart(df):
+    fig = px.line(df, x='Year', y='Closing Rank',
+                  color='Course Name',
+                  hover_name='Course Name', hover_data=['Opening Rank', 'Closing Rank % Change'], markers=True,
                   title='Rank Changes Over Years')
     fig.update_layout(
-        legend_title_text='Quota-Gender',
-        xaxis_title='Course Name',
-        yaxis_title='Rank',
+        legend_title_text='Course Name',
+        xaxis_title='Year',
+        yaxis_title='Closing Rank',
+        xaxis={'dtick': 1},
         annotations=[{
             'text': 'collegedekho',
             'xref': 'paper', 'yref': 'paper',
@@ -76,59 +84,123 @@ def create_plotly_chart(df, year1, year2):
     )
     return fig
 
+# Function to load an uploaded JoSAA file once per content hash, indexed for slicing by key
+# Shared across reruns and sessions, so callers must not modify the returned frame
+@st.cache_resource(max_entries=8, show_spinner="Preparing the JoSAA data...")
+def load_year(file_hash, registry_generation, _file_bytes):
+    return load_josaa(_file_bytes)
+
+def load_upload(uploaded_file, registry_generation):
+    return load_year(hashlib.sha256(uploaded_file.getbuffer()).hexdigest(), registry_generation, uploaded_file.getvalue())
+
+# Function to combine the uploaded years into one long table, once per set of files, years and rounds
+@st.cache_resource(max_entries=4, show_spinner="Combining the years...")
+def load_long_table(entries_key, registry_generation, _frames):
+    return build_long_table([(year, round_number, df) for (_, year, round_number), df in zip(entries_key, _frames)])
+
+# Function to compute the trends of every group at once for the chosen round
+@st.cache_resource(max_entries=8, show_spinner="Computing rank trends...")
+def load_trends(entries_key, registry_generation, round_number, _long_df):
+    return compute_trends(_long_df, round_number)
+
+# Function to build the seat predictor's sorted closing-rank index once per set of files and round
+@st.cache_resource(max_entries=8, show_spinner="Indexing closing ranks...")
+def load_predictor(entries_key, registry_generation, round_number, _long_df):
+    return SeatPredictor(_long_df, round_number)
+
 # Main Streamlit application starts here
 st.title('College Rank Comparison Tool')
 
-# Input for years and file uploads
-year1 = st.text_input("Enter year for the first file:")
-year2 = st.text_input("Enter year for the second file:")
-file1 = st.file_uploader(f"Upload the Excel file for {year1}", type=["xlsx"], key="file1")
-file2 = st.file_uploader(f"Upload the Excel file for {year2}", type=["xlsx"], key="file2")
-
-if file1 and file2 and year1 and year2:
-    df1 = pd.read_excel(file1)
-    df2 = pd.read_excel(file2)
-
-    df1 = preprocess_dataframe(df1)
-    df2 = preprocess_dataframe(df2)
-
-    college_names = pd.concat([df1['College Name'], df2['College Name']]).unique()
-    selected_college = st.selectbox('Select a College', college_names)
-
-    if selected_college:
-        course_names = pd.concat([df1[df1['College Name'] == selected_college]['Course Name'], df2[df2['College Name'] == selected_college]['Course Name']]).unique()
-        selected_course = st.selectbox('Select a Course (optional)', ['Any'] + list(course_names))
-
-        if selected_course and selected_course != 'Any':
-            df1 = df1[(df1['College Name'] == selected_college) & (df1['Course Name'] == selected_course)]
-            df2 = df2[(df2['College Name'] == selected_college) & (df2['Course Name'] == selected_course)]
-        else:
-            df1 = df1[df1['College Name'] == selected_college]
-            df2 = df2[df2['College Name'] == selected_college]
-
-        selected_quota = st.selectbox('Select Quota', df1['Quota'].unique())
-        selected_gender = st.selectbox('Select Gender', df1['Gender'].unique())
-        selected_seat_type = st.selectbox('Select Seat Type', df1['Seat Type'].unique())
-
-        filtered_df = df1[(df1['Quota'] == selected_quota) & (df1['Gender'] == selected_gender) & (df1['Seat Type'] == selected_seat_type)]
-
-        merged_df = merge_dataframes(filtered_df, df2, ['College Name', 'Course Name', 'Quota', 'Seat Type', 'Gender'], year1, year2)
-
-        if not merged_df.empty:
-            # Exclude "College Name" from the displayed table
-            st.write("Comparison of Opening and Closing Ranks for Selected Filters:")
-            st.table(merged_df.drop(columns=['College Name'], errors='ignore'))
-
-            fig = create_plotly_chart(merged_df, year1, year2)
-            st.plotly_chart(fig)
-
-            doc_filename = create_word_file(merged_df, fig)
-            with open(doc_filename, "rb") as file:
-                st.download_button(
-                    label="Download Report as Word Document",
-                    data=file,
-                    file_name=doc_filename,
-                    mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-                )
-        else:
-            st.write("No matching data found for the selected filters.")
+# Any number of years (and rounds), each file tagged with its year and round
+uploaded_files = st.file_uploader("Upload the JoSAA Excel files (one per year or round)", type=["xlsx"], accept_multiple_files=True)
+
+entries = []
+for uploaded_file in uploaded_files or []:
+    inferred_year, inferred_round = infer_year_round(uploaded_file.name)
+    year_col, round_col = st.columns(2)
+    year = year_col.number_input(f"Year of {uploaded_file.name}", min_value=2000, max_value=2100,
+                                 value=inferred_year or datetime.date.today().year, key=f"year_{uploaded_file.file_id}")
+    round_number = round_col.number_input(f"Round of {uploaded_file.name} (0 if it has a single round)", min_value=0,
+                                          max_value=20, value=inferred_round or 0, key=f"round_{uploaded_file.file_id}")
+    entries.append((uploaded_file, int(year), int(round_number)))
+
+if entries:
+    # Each file is parsed once; the years are combined into one long table and the trends of every group computed at once
+    entries_key = tuple((hashlib.sha256(f.getbuffer()).hexdigest(), year, round_number) for f, year, round_number in entries)
+    # College IDs come from the registry, so every cache below is also keyed by the registry's generation
+    registry = open_registry()
+    registry_generation = registry.generation()
+    long_df = load_long_table(entries_key, registry_generation, [load_upload(f, registry_generation) for f, _, _ in entries])
+
+    rounds = sorted(long_df['Round'].unique().tolist())
+    selected_round = st.selectbox('Round', ['Final'] + rounds, format_func=lambda r: 'Final round of each year' if r == 'Final' else f'Round {r}')
+    mode = st.radio('Mode', ['Rank Trends', 'Seat Predictor'], horizontal=True)
+
+    if mode == 'Seat Predictor':
+        # Every (college, course) a rank is eligible for, answered by binary search over precomputed closing ranks
+        predictor = load_predictor(entries_key, registry_generation, None if selected_round == 'Final' else selected_round, long_df)
+        rank = st.number_input("Candidate's rank (category rank for the chosen seat type)", min_value=1, value=10000, step=1)
+        quota = st.selectbox('Quota', predictor.quotas)
+        seat_type = st.selectbox('Seat Type', predictor.seat_types)
+        gender = st.selectbox('Gender', predictor.genders)
+        years = st.multiselect('Year(s)', predictor.years, default=predictor.years[-1:])
+
+        eligible = predictor.query(rank, quota, seat_type, gender, years)
+        eligible.insert(0, 'College Name', registry.names_for(eligible.pop('College ID')).to_numpy())
+        for col in ['Opening Rank', 'Closing Rank']:
+            eligible[col] = eligible[col].round().astype("Int64")
+        st.write(f"{len(eligible)} eligible seats (college, course and year), ordered by closing rank:")
+        st.dataframe(eligible, hide_index=True)
+        st.download_button(
+            label="Download Eligible Seats as CSV",
+            data=eligible.to_csv(index=False),
+            file_name="eligible_seats.csv",
+            mime="text/csv",
+        )
+
+    if mode == 'Rank Trends':
+        trends = load_trends(entries_key, registry_generation, None if selected_round == 'Final' else selected_round, long_df)
+
+        college_ids = sorted(level_values(trends, 'College ID'), key=registry.name)
+        selected_college = st.selectbox('Select a College', college_ids, format_func=registry.name)
+
+        if selected_college is not None:
+            course_names = level_values(select(trends, selected_college), 'Course Name')
+            selected_course = st.selectbox('Select a Course (optional)', ['Any'] + course_names)
+            if selected_course == 'Any':
+                selected_course = None
+
+            college_trends = select(trends, selected_college, selected_course)
+
+            selected_quota = st.selectbox('Select Quota', level_values(college_trends, 'Quota'))
+            selected_gender = st.selectbox('Select Gender', level_values(college_trends, 'Gender'))
+            selected_seat_type = st.selectbox('Select Seat Type', level_values(college_trends, 'Seat Type'))
+
+            if None in (selected_quota, selected_gender, selected_seat_type):
+                filtered_df = college_trends.iloc[:0]
+            else:
+                filtered_df = select(trends, selected_college, selected_course, selected_quota, selected_seat_type, selected_gender)
+
+            if not filtered_df.empty:
+                table_df = format_trend_table(filtered_df)
+                # Exclude "College Name" and "College ID" from the displayed table
+                st.write("Opening and Closing Ranks by Year for Selected Filters:")
+                st.table(table_df)
+
+                sentences = trend_sentences(summarize_trends(filtered_df))
+                for sentence in sentences:
+                    st.write(sentence)
+
+                fig = create_plotly_chart(filtered_df.reset_index())
+                st.plotly_chart(fig)
+
+                doc_filename = create_word_file(table_df, fig, sentences)
+                with open(doc_filename, "rb") as file:
+                    st.download_button(
+                        label="Download Report as Word Document",
+                        data=file,
+                        file_name=doc_filename,
+                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+                    )
+            else:
+                st.write("No matching data found for the selected filters.")
@@ -0,0 +1,155 @@
+import datetime
+import functools
+import importlib
+import json
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import streamlit as st
+
+JOBS_DIR = os.path.join(".cache", "jobs")
+MAX_CONCURRENT_JOBS = 2  # Further jobs wait in the queue until a worker process is free
+
+# Job kinds and the "module:function" each one runs in the worker process
+JOB_TARGETS = {
+    "college_export": "college_export:run_export_job",
+    "googlerankingscraper": "googlerankingscraper:run_serp_job",
+    "mapper": "stream_mapping:run_mapping_job",
+    "ranktracker": "ranktracker:run_ranking_job",
+    "serpranking": "serpranking:run_serpapi_job",
+}
+
+
+def get_job_dir(job_id):
+    return os.path.join(JOBS_DIR, job_id)
+
+
+# Function to read a job's persisted status, or None if the job does not exist
+def read_status(job_id):
+    status_file = os.path.join(get_job_dir(job_id), "status.json")
+    if not os.path.exists(status_file):
+        return None
+    with open(status_file) as f:
+        return json.load(f)
+
+
+# Function to merge updates into a job's status file; written atomically so pollers never see half a file
+def write_status(job_id, **updates):
+    status = read_status(job_id) or {"job_id": job_id}
+    status.update(updates)
+    os.makedirs(get_job_dir(job_id), exist_ok=True)
+    tmp_file = os.path.join(get_job_dir(job_id), f"status.json.{os.getpid()}.tmp")  # Per process: the page and the worker both write it
+    with open(tmp_file, "w") as f:
+        json.dump(status, f)
+    os.replace(tmp_file, os.path.join(get_job_dir(job_id), "status.json"))
+    return status
+
+
+# Handle given to job functions for result files and progress reporting
+class JobContext:
+    def __init__(self, job_id):
+        self.job_id = job_id
+
+    # Function to get the path of a result file inside this job's own folder
+    def result_path(self, file_name):
+        return os.path.join(get_job_dir(self.job_id), file_name)
+
+    def report_progress(self, done, total, message=None):
+        write_status(self.job_id, done=done, total=total, message=message)
+
+
+def is_process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# Function executed in the worker process: imports the job's target and records the outcome
+def run_job(job_id, target, args):
+    write_status(job_id, status="running", started_at=time.time(), worker_pid=os.getpid())
+    module_name, function_name = target.split(":")
+    try:
+        job_function = getattr(importlib.import_module(module_name), function_name)
+        result_file = job_function(JobContext(job_id), *args)
+        write_status(job_id, status="completed", finished_at=time.time(), result_file=result_file)
+    except Exception as e:
+        write_status(job_id, status="failed", finished_at=time.time(), error=f"{type(e).__name__}: {e}")
+
+
+# Function to get the process pool shared by every session of this Streamlit server
+@functools.lru_cache(maxsize=None)
+def get_executor():
+    # Spawned workers avoid forking the multi-threaded Streamlit server
+    return ProcessPoolExecutor(max_workers=MAX_CONCURRENT_JOBS, mp_context=multiprocessing.get_context("spawn"))
+
+
+# Function to queue a job; args are passed to the worker in memory only, so secrets never reach disk
+def submit_job(kind, args, description=""):
+    job_id = f"{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    write_status(
+        job_id,
+        kind=kind,
+        description=description,
+        status="queued",
+        created_at=time.time(),
+        server_pid=os.getpid(),
+        done=0,
+        total=None,
+    )
+    get_executor().submit(run_job, job_id, JOB_TARGETS[kind], args)
+    return job_id
+
+
+# Function to list jobs (optionally of one kind), newest first, flagging jobs whose process has died
+def list_jobs(kind=None):
+    if not os.path.isdir(JOBS_DIR):
+        return []
+    jobs = []
+    for job_id in os.listdir(JOBS_DIR):
+        status = read_status(job_id)
+        if status is None or (kind and status.get("kind") != kind):
+            continue
+        if status["status"] == "queued" and not is_process_alive(status["server_pid"]):
+            status = write_status(job_id, status="failed", error="The server restarted before the job started.")
+        elif status["status"] == "running" and not is_process_alive(status["worker_pid"]):
+            status = write_status(job_id, status="failed", error="The worker process exited unexpectedly.")
+        jobs.append(status)
+    return sorted(jobs, key=lambda job: job["created_at"], reverse=True)
+
+
+# Function to render job status, progress and result downloads on a Streamlit page
+def show_jobs(kind, limit=20):
+    st.write("### Background Jobs")
+    st.button("Refresh Job Status", key=f"refresh_jobs_{kind}")
+    jobs = list_jobs(kind)[:limit]
+    if not jobs:
+        st.info("No background jobs yet.")
+        return
+
+    for job in jobs:
+        created = datetime.datetime.fromtimestamp(job["created_at"]).strftime("%Y-%m-%d %H:%M:%S")
+        st.write(f"**{job['description'] or job['job_id']}** ({created}) - {job['status']}")
+        if job.get("message"):
+            st.caption(job["message"])
+        if job["status"] in ("queued", "running"):
+            total = job.get("total") or 0
+            done = job.get("done") or 0
+            progress_text = f"{done}/{total}" if total else "Waiting to start..."
+            st.progress(done / total if total else 0.0, text=progress_text)
+        elif job["status"] == "failed":
+            st.error(job.get("error", "Job failed."))
+        elif job.get("result_file") and os.path.exists(job["result_file"]):
+            with open(job["result_file"], "rb") as file:
+                st.download_button(
+                    label="Download Results",
+                    data=file,
+                    file_name=os.path.basename(job["result_file"]),
+                    key=f"download_{job['job_id']}",
+                )
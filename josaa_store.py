@@ -0,0 +1,92 @@
+import hashlib
+import os
+from io import BytesIO
+
+import pandas as pd
+import pyarrow.feather as feather
+
+from college_registry import open_registry
+
+STORE_DIR = os.path.join(".cache", "josaa_store")
+STORE_FORMAT_VERSION = 2  # Bump when prepare_josaa changes, so stored files are rebuilt
+KEY_COLUMNS = ['College ID', 'Course Name', 'Quota', 'Seat Type', 'Gender']
+
+
+# Function to standardize the dataframe column names and remove unnecessary columns
+def preprocess_dataframe(df):
+    # Remove unwanted columns (e.g., Unnamed columns)
+    df.dropna(axis=1, how='all', inplace=True)
+    df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
+
+    df.rename(columns={
+        'Institute': 'College Name',
+        'Academic Program Name': 'Course Name',
+        'Quota': 'Quota',
+        'Seat Type': 'Seat Type',
+        'Gender': 'Gender',
+        'Opening Rank': 'Opening Rank',
+        'Closing Rank': 'Closing Rank'
+    }, inplace=True)
+    return df
+
+
+# Function to turn a parsed JoSAA sheet into the stored form: college names and the other key columns
+# as categoricals, rows sorted by the key. College IDs are not stored: they depend on the registry,
+# which can change after the file is stored, so they are looked up on every load
+def prepare_josaa(df):
+    df = preprocess_dataframe(df)
+    df = df.dropna(subset=['College Name'])
+    for col in df.columns:
+        if col in ['College Name'] + KEY_COLUMNS[1:]:
+            df[col] = df[col].astype(str).astype("category")
+        elif df[col].dtype == object:
+            # Cells mixing text and numbers (e.g. "123P" ranks) are stored as their text, as the page shows them
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df.sort_values(['College Name'] + KEY_COLUMNS[1:], kind="stable").reset_index(drop=True)
+
+
+def store_path(content_hash):
+    return os.path.join(STORE_DIR, f"josaa_v{STORE_FORMAT_VERSION}_{content_hash[:16]}.feather")
+
+
+# Function to replace the college names with their IDs in the canonical college registry (a read-only lookup),
+# so spellings that differ between years still join on the same college
+# Each distinct name is looked up once, through the categories of the name column
+def assign_college_ids(df, registry):
+    names = df.pop('College Name')
+    category_ids = registry.lookup(names.cat.categories).to_numpy()
+    df.insert(0, 'College ID', category_ids[names.cat.codes.to_numpy()])
+    return df.dropna(subset=['College ID']).astype({'College ID': "int32"})
+
+
+# Function to load a JoSAA workbook, parsing it only the first time its content is seen
+# Returns the rows indexed by a sorted (College ID, Course Name, Quota, Seat Type, Gender) MultiIndex,
+# with the IDs of the registry as it is now
+def load_josaa(file_bytes, registry=None):
+    cache_file = store_path(hashlib.sha256(file_bytes).hexdigest())
+    if not os.path.exists(cache_file):
+        df = prepare_josaa(pd.read_excel(BytesIO(file_bytes)))
+        os.makedirs(STORE_DIR, exist_ok=True)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"  # Per process, in case two sessions store the same file at once
+        feather.write_feather(df, tmp_file, compression="uncompressed")
+        os.replace(tmp_file, cache_file)
+
+    df = feather.read_table(cache_file, memory_map=True).to_pandas()
+    df = assign_college_ids(df, registry or open_registry())
+    return df.set_index(KEY_COLUMNS).sort_index()
+
+
+# Function to select rows by key through the index; None leaves that level unfiltered
+def select(df, college_id=None, course=None, quota=None, seat_type=None, gender=None):
+    values = (college_id, course, quota, seat_type, gender)
+    # One-element lists keep every level (and a DataFrame) even when the key is complete
+    try:
+        return df.loc[tuple(slice(None) if value is None else [value] for value in values), :]
+    except KeyError:
+        # A missing value, or a combination of existing values that has no rows, means no rows rather than an error
+        return df.iloc[:0]
+
+
+# Function to list the distinct values of one key level, in sorted order
+def level_values(df, level):
+    return df.index.get_level_values(level).unique().sort_values().tolist()
@@ -1,9 +1,13 @@
+import hashlib
+import os
 import streamlit as st
 import pandas as pd
 from fuzzywuzzy import fuzz
 from fuzzywuzzy import process
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.feature_extraction.text import TfidfVectorizer
+from name_matching import DEFAULT_TOP_K, NameMatcher
+from college_registry import open_registry
+from job_runner import show_jobs, submit_job
+from stream_mapping import STREAM_DIR
 
 # Function to load the files
 def load_file(file):
@@ -13,6 +17,114 @@ def load_file(file):
 def fuzzy_match(college_name, college_list):
     return process.extractOne(college_name, college_list, scorer=fuzz.token_sort_ratio)
 
+# Function to build the TF-IDF matcher for a list of colleges once, keyed by a hash of the list
+@st.cache_resource(max_entries=4, show_spinner="Indexing the college list...")
+def get_name_matcher(list_hash, _college_list):
+    return NameMatcher(_college_list)
+
+# Function to get the matcher of a college list (list B)
+def build_matcher(college_list):
+    college_list = [str(name) for name in college_list]
+    list_hash = hashlib.sha256("\x1f".join(college_list).encode("utf-8")).hexdigest()
+    return get_name_matcher(list_hash, college_list)
+
 # Function to apply TF-IDF vectorizer and cosine similarity for college names
+# Returns (best match, cosine similarity), or (None, 0.0) when nothing is similar
 def match_using_tfidf(college_name_a, college_list_b):
-    vectorizer = T
+    matcher = build_matcher(college_list_b)
+    candidates, similarities = matcher.top_candidates([college_name_a], k=1)
+    if similarities[0][0] <= 0:
+        return None, 0.0
+    return matcher.names[candidates[0][0]], float(similarities[0][0])
+
+# Function to map every name of list A to its closest college in list B
+def map_names(names_a, matcher, top_k=DEFAULT_TOP_K, min_score=0, on_progress=None):
+    rows = []
+    for index, score, similarity in matcher.iter_matches(names_a, k=top_k, on_progress=on_progress):
+        rows.append({
+            'Matched Name': matcher.names[index] if index is not None else None,
+            'Match Score': score,
+            'TF-IDF Similarity': round(similarity, 4),
+            'Matched': index is not None and score >= min_score,
+        })
+    return pd.DataFrame(rows)
+
+# Function to save an uploaded file to disk under its content hash, so a re-upload reuses (and resumes) the same run
+def save_upload(uploaded_file):
+    upload_dir = os.path.join(STREAM_DIR, "uploads")
+    os.makedirs(upload_dir, exist_ok=True)
+    path = os.path.join(upload_dir, f"{hashlib.sha256(uploaded_file.getbuffer()).hexdigest()[:16]}.csv")
+    if not os.path.exists(path):
+        tmp_file = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_file, "wb") as f:
+            f.write(uploaded_file.getbuffer())
+        os.replace(tmp_file, path)
+    return path
+
+# Streaming mode: List A is mapped in chunks by a background job and written straight to a CSV on disk
+def streaming_mode(file_a, file_b):
+    columns_a = pd.read_csv(file_a, nrows=0).columns.tolist()  # Only the header; the job reads the rows
+    file_a.seek(0)
+    df_b = load_file(file_b)
+
+    column_a = st.selectbox("College name column in List A", columns_a)
+    column_b = st.selectbox("College name column in List B", df_b.columns.tolist())
+    top_k = st.slider("Candidates re-scored per name", min_value=1, max_value=20, value=DEFAULT_TOP_K)
+    min_score = st.slider("Minimum match score", min_value=0, max_value=100, value=80)
+
+    if st.button("Queue Streaming Mapping"):
+        input_path = save_upload(file_a)
+        college_list = df_b[column_b].dropna().astype(str).tolist()
+        submit_job("mapper", (input_path, column_a, college_list, top_k, min_score), description=f"Mapping {file_a.name}")
+        st.success("Mapping queued. Track its progress below; re-queue the same files to resume an interrupted run.")
+
+    show_jobs("mapper")
+
+# Streamlit app
+def main():
+    st.title('College Name Mapper')
+    st.write("Upload the list of names to map (List A) and the list of colleges to map them to (List B). "
+             "Each name in List A is matched to its closest college in List B.")
+
+    file_a = st.file_uploader("Upload List A (CSV)", type="csv")
+    file_b = st.file_uploader("Upload List B (CSV)", type="csv")
+    streaming = st.checkbox("Streaming mode for very large List A files (mapped in the background, written in chunks)")
+
+    if streaming:
+        if file_a and file_b:
+            streaming_mode(file_a, file_b)
+    elif file_a and file_b:
+        df_a = load_file(file_a)
+        df_b = load_file(file_b)
+
+        column_a = st.selectbox("College name column in List A", df_a.columns.tolist())
+        column_b = st.selectbox("College name column in List B", df_b.columns.tolist())
+        top_k = st.slider("Candidates re-scored per name", min_value=1, max_value=20, value=DEFAULT_TOP_K)
+        min_score = st.slider("Minimum match score", min_value=0, max_value=100, value=80)
+        save_aliases = st.checkbox("Save accepted matches as aliases in the college registry")
+
+        if st.button("Map Names"):
+            # List B is indexed once; every name of List A is matched against that index
+            matcher = build_matcher(df_b[column_b].dropna().astype(str).tolist())
+            progress_bar = st.progress(0.0, text=f"Mapped 0/{len(df_a)} names")
+            matches = map_names(
+                df_a[column_a].tolist(), matcher, top_k, min_score,
+                on_progress=lambda done, total: progress_bar.progress(done / total, text=f"Mapped {done}/{total} names"),
+            )
+            result_df = pd.concat([df_a.reset_index(drop=True), matches], axis=1)
+
+            st.write(f"Matched {int(result_df['Matched'].sum())} of {len(result_df)} names with a score of at least {min_score}.")
+            if save_aliases:
+                accepted = result_df[result_df['Matched']]
+                added = open_registry().add_aliases(zip(accepted[column_a].astype(str), accepted['Matched Name']))
+                st.write(f"Saved {added} new aliases to the college registry.")
+            st.dataframe(result_df)
+            st.download_button(
+                label="Download Mapped Results as CSV",
+                data=result_df.to_csv(index=False),
+                file_name="mapped_colleges.csv",
+                mime="text/csv",
+            )
+
+if __name__ == "__main__":
+    main()
@@ -1,54 +1,197 @@
 import streamlit as st
 import pandas as pd
+import hashlib
+import multiprocessing
+import os
+import openpyxl
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from io import BytesIO
 
-# Function to read and extract the selected sheet from an Excel file, skipping the first row (header starts from second row)
-def read_selected_sheet(file, sheet_name):
+# The per-file work lives in an importable module so spawned worker processes can run it
+from sheet_ingest import (iter_part, load_stored_sheet, prune_directory, select_columns, sheet_store_path, store_sheet,
+                          stream_selected_sheet, stream_sheet_to_part)
+
+PREVIEW_ROWS = 50  # Rows shown in the streaming-mode preview
+MAX_INGEST_WORKERS = min(4, os.cpu_count() or 1)  # Files read in parallel during a merge
+MERGED_DIR = os.path.join(".cache", "merged")  # Streaming-mode merged workbooks
+MAX_MERGED_FILES = 40  # Merged workbooks and their summaries kept on disk
+
+# Function to read a parsed sheet from the shared store, once per content hash and sheet name
+# The frame is shared across reruns and sessions, so callers must not modify it in place
+@st.cache_resource(max_entries=200, show_spinner=False)
+def get_stored_sheet(content_hash, sheet_name):
+    return load_stored_sheet(content_hash, sheet_name)
+
+# Function to get the parsed sheet of an uploaded file; only that sheet is parsed, once per content hash
+# The merge workers find it already in the store, so the previewed file is not parsed a second time
+def load_sheet(file, sheet_name):
+    file_bytes = file.getvalue()
+    content_hash = hashlib.sha256(file_bytes).hexdigest()
+    messages = store_sheet(file.name, content_hash, file_bytes, sheet_name)
+    if messages:
+        raise ValueError(messages[0][1])
+    return get_stored_sheet(content_hash, sheet_name)
+
+# Function to list sheet names without parsing any sheet data
+@st.cache_data(max_entries=200, show_spinner=False)
+def list_sheet_names(content_hash, _file_bytes):
+    workbook = openpyxl.load_workbook(BytesIO(_file_bytes), read_only=True)
     try:
-        # Read the selected sheet, skip the first row if header starts from second row
-        df = pd.read_excel(file, sheet_name=sheet_name, header=1)
-        st.success(f"Extracted '{sheet_name}' sheet from {file.name}")
-        return df
-    except Exception as e:
-        st.error(f"Error processing file: {file.name} - {e}")
-        return None
+        return workbook.sheetnames
+    finally:
+        workbook.close()
+
+# Function to preview the first rows of a sheet in streaming mode
+def preview_sheet_streaming(file, sheet_name):
+    columns, chunks = stream_selected_sheet(file.getvalue(), sheet_name, chunk_rows=PREVIEW_ROWS)
+    preview = next(chunks, pd.DataFrame(columns=columns))
+    chunks.close()
+    return preview
+
+# Function to get the worker processes that parse the uploads in parallel
+@st.cache_resource(show_spinner=False)
+def get_ingest_pool():
+    # Spawned workers avoid forking the multi-threaded Streamlit server
+    return ProcessPoolExecutor(max_workers=MAX_INGEST_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+# Function to run one task per upload (in the workers, or inline when there is a single one), gathered back in order
+def run_per_upload(task, uploads):
+    if len(uploads) == 1:
+        # A single file is not worth the cost of starting worker processes
+        return [task(*uploads[0])]
+    pool = get_ingest_pool()
+    futures = [pool.submit(task, *upload) for upload in uploads]
+    return [future.result() for future in futures]
+
+# Function to parse the selected sheets that are not in the shared store yet (one worker per file)
+# Returns each upload's messages, in upload order; the columns are selected afterwards, so changing them re-parses nothing
+def store_uploads(uploads):
+    messages = [[] for _ in uploads]
+    missing = [i for i, (_, content_hash, _, sheet_name) in enumerate(uploads)
+               if not os.path.exists(sheet_store_path(content_hash, sheet_name))]
+    if missing:
+        with st.spinner("Reading files..."):
+            for i, upload_messages in zip(missing, run_per_upload(store_sheet, [uploads[i] for i in missing])):
+                messages[i] = upload_messages
+    return messages
+
+# Function to collect the uploads that have a selected sheet: (file name, content hash, file bytes, sheet name)
+def collect_uploads(files, selected_sheets):
+    uploads = []
+    for file in files:
+        sheet_name = selected_sheets.get(file.name)
+        if sheet_name is None:
+            continue
+        file_bytes = file.getvalue()
+        uploads.append((file.name, hashlib.sha256(file_bytes).hexdigest(), file_bytes, sheet_name))
+    return uploads
+
+# Function to report each file's outcome in upload order, as the workers cannot call Streamlit themselves
+def show_messages(messages):
+    for level, message in messages:
+        getattr(st, level)(message)
 
 # Function to merge multiple DataFrames, including the file name as a column, and remove blank rows
 def merge_files(files, selected_sheets, selected_headers):
-    merged_df = pd.DataFrame()
-
-    for i, file in enumerate(files):
-        sheet_name = selected_sheets[i]
-        df = read_selected_sheet(file, sheet_name)
-        if df is not None:
-            # Normalize headers
-            df.columns = df.columns.str.strip().str.lower()
+    uploads = collect_uploads(files, selected_sheets)
+    if not uploads:
+        return pd.DataFrame()
 
-            # Debug: Check headers in each file
-            st.write(f"Headers in {file.name}: {df.columns.tolist()}")
+    try:
+        store_messages = store_uploads(uploads)
+    except BrokenProcessPool:
+        get_ingest_pool.clear()  # Start fresh workers on the next attempt
+        st.error("A worker process stopped unexpectedly while reading the files. Please try again.")
+        return pd.DataFrame()
 
-            # Get the selected headers (ensure they exist in the current file's sheet and are valid strings)
-            available_headers = [
-                col for col in df.columns 
-                if col in [header.lower() for header in selected_headers if isinstance(header, str)]
-            ]
-            if not available_headers:
-                st.warning(f"No matching columns found in {file.name} for selected headers.")
-                continue
+    frames = []
+    for (file_name, content_hash, _, sheet_name), messages in zip(uploads, store_messages):
+        if not messages:
+            df_filtered, messages = select_columns(get_stored_sheet(content_hash, sheet_name), file_name, sheet_name, selected_headers)
+            if df_filtered is not None:
+                frames.append(df_filtered)
+        show_messages(messages)
 
-            # Filter the DataFrame to include only the selected headers
-            df_filtered = df[available_headers]
+    # Concatenate once at the end; growing a frame inside the loop is quadratic in total rows
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
 
-            # Remove rows where all selected columns are blank
-            df_filtered = df_filtered.dropna(how='all', subset=available_headers)
+# Function to copy the part files into one write-only workbook, chunk by chunk
+# part_results are (written columns or None, part file) per upload; returns (first PREVIEW_ROWS rows, total rows)
+def write_merged_workbook(part_results, output_path):
+    # Columns in first-seen order across the files, as pd.concat would line them up
+    columns = list(dict.fromkeys(col for file_columns, _ in part_results if file_columns for col in file_columns))
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('Merged Data')
+    sheet.append(columns)
+    preview = []
+    rows = 0
+    for file_columns, part_path in part_results:
+        if not file_columns:
+            continue
+        for chunk in iter_part(part_path):
+            chunk = chunk.reindex(columns=columns)
+            if rows < PREVIEW_ROWS:
+                preview.append(chunk.head(PREVIEW_ROWS - rows))
+            rows += len(chunk)
+            for values in chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None):
+                sheet.append(values)
+    tmp_file = f"{output_path}.{os.getpid()}.tmp"
+    workbook.save(tmp_file)
+    os.replace(tmp_file, output_path)
+    return (pd.concat(preview, ignore_index=True) if preview else pd.DataFrame(columns=columns)), rows
 
-            # Add a column for the file name
-            df_filtered['source_file'] = file.name
+# Function to merge the uploads in streaming mode without holding whole sheets in memory: each worker streams its
+# sheet into a part file as it reads it, then the parts are copied chunk by chunk into a write-only workbook
+# Returns (merged workbook path, preview rows, total rows) or None; kept on disk per files, sheets and headers,
+# so reruns (e.g. the download click) reuse the result
+def merge_files_streaming(files, selected_sheets, selected_headers):
+    uploads = collect_uploads(files, selected_sheets)
+    if not uploads:
+        return None
 
-            # Add the filtered data to the merged DataFrame
-            merged_df = pd.concat([merged_df, df_filtered], ignore_index=True)
+    merge_key = hashlib.sha256(repr((
+        [(file_name, content_hash, sheet_name) for file_name, content_hash, _, sheet_name in uploads],
+        list(selected_headers),
+    )).encode("utf-8")).hexdigest()[:16]
+    output_path = os.path.join(MERGED_DIR, f"merged_{merge_key}.xlsx")
+    summary_path = f"{output_path}.summary.pkl"
+    if os.path.exists(output_path) and os.path.exists(summary_path):
+        preview, rows, file_messages = pd.read_pickle(summary_path)
+    else:
+        os.makedirs(MERGED_DIR, exist_ok=True)
+        part_paths = [os.path.join(MERGED_DIR, f"part_{merge_key}_{i}.{os.getpid()}.tmp") for i in range(len(uploads))]
+        try:
+            with st.spinner("Merging files..."):
+                results = run_per_upload(stream_sheet_to_part, [
+                    (file_name, file_bytes, sheet_name, list(selected_headers), part_path)
+                    for (file_name, _, file_bytes, sheet_name), part_path in zip(uploads, part_paths)
+                ])
+                preview, rows = write_merged_workbook(
+                    [(file_columns, part_path) for (file_columns, _, _), part_path in zip(results, part_paths)],
+                    output_path,
+                )
+        except BrokenProcessPool:
+            get_ingest_pool.clear()  # Start fresh workers on the next attempt
+            st.error("A worker process stopped unexpectedly while reading the files. Please try again.")
+            return None
+        finally:
+            for part_path in part_paths:
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+        file_messages = [messages for _, _, messages in results]
+        # A file that failed to read is retried on the next run instead of being remembered
+        if not any(level == "error" for messages in file_messages for level, _ in messages):
+            pd.to_pickle((preview, rows, file_messages), summary_path)
+        prune_directory(MERGED_DIR, MAX_MERGED_FILES)
 
-    return merged_df
+    for messages in file_messages:
+        show_messages(messages)
+    if not rows:
+        return None
+    return output_path, preview, rows
 
 # Streamlit app interface
 st.title('Custom Sheet Merger with Source File')
@@ -58,56 +201,76 @@ st.write("Upload multiple Excel files, select the sheet to merge for each file,
 # Upload multiple files
 uploaded_files = st.file_uploader("Choose Excel files", accept_multiple_files=True, type="xlsx")
 
+# Streaming mode never materializes whole sheets: it suits very large workbooks where only a few columns are kept
+streaming = st.checkbox("Streaming mode for very large workbooks (reads only the selected columns)")
+
 if uploaded_files:
-    # Collect all available sheet names for each uploaded file
+    # Collect all available sheet names for each uploaded file (without parsing sheet data;
+    # each selected sheet is parsed once, into the shared sheet store)
     file_sheets = {}
     for file in uploaded_files:
         try:
-            sheet_names = pd.ExcelFile(file).sheet_names
-            file_sheets[file.name] = sheet_names
+            file_bytes = file.getvalue()
+            file_sheets[file.name] = list_sheet_names(hashlib.sha256(file_bytes).hexdigest(), file_bytes)
         except Exception as e:
             st.error(f"Error reading file {file.name}: {e}")
 
     # Dictionary to store user selections of sheets for each file
-    selected_sheets = []
+    selected_sheets = {}
 
     # Display available sheets for each file and allow user to select one with radio buttons
     for file_name, sheets in file_sheets.items():
         st.write(f"**Select a sheet for file: {file_name}**")
         selected_sheet = st.radio(f"Available sheets in {file_name}", sheets, key=file_name)
-        selected_sheets.append(selected_sheet)
+        selected_sheets[file_name] = selected_sheet
 
     if selected_sheets:
         # If sheets have been selected, show the example of the first file's selected sheet
+        first_file = next(file for file in uploaded_files if file.name in selected_sheets)
+        df_example = pd.DataFrame()
         try:
-            df_example = pd.read_excel(uploaded_files[0], sheet_name=selected_sheets[0], header=1)
-            # Normalize column names in the preview DataFrame
-            df_example.columns = df_example.columns.str.strip().str.lower()
-            st.write(f"Preview of the first file's '{selected_sheets[0]}' sheet (normalized column names):")
-            
+            if streaming:
+                df_example = preview_sheet_streaming(first_file, selected_sheets[first_file.name])
+            else:
+                df_example = load_sheet(first_file, selected_sheets[first_file.name])
+            st.write(f"Preview of the first file's '{selected_sheets[first_file.name]}' sheet (normalized column names):")
+
             # Ensure only valid columns are displayed
             st.dataframe(df_example.select_dtypes(include=[int, float, object]))  # Show only valid types
         except Exception as e:
-            st.error(f"Error displaying preview for {uploaded_files[0].name}: {e}")
-        
+            df_example = pd.DataFrame()
+            st.error(f"Error displaying preview for {first_file.name}: {e}")
+
         # Let the user select the headers they want to include in the final merged output
         selected_headers = st.multiselect("Select the columns to include", df_example.columns.tolist())
 
         if selected_headers:
             # Merge the files based on the selected sheet and headers
-            merged_data = merge_files(uploaded_files, selected_sheets, selected_headers)
+            output = None
+            if streaming:
+                # The merged rows are written to disk as they are read; only a preview is kept in memory
+                merged = merge_files_streaming(uploaded_files, selected_sheets, selected_headers)
+                if merged is not None:
+                    output_path, merged_preview, merged_rows = merged
+                    st.write(f"Merged Data Preview (first {len(merged_preview)} of {merged_rows} rows):")
+                    st.dataframe(merged_preview)
+                    with open(output_path, "rb") as merged_file:
+                        output = merged_file.read()
+            else:
+                merged_data = merge_files(uploaded_files, selected_sheets, selected_headers)
 
-            if not merged_data.empty:
-                st.write("Merged Data Preview:")
-                st.dataframe(merged_data)
+                if not merged_data.empty:
+                    st.write("Merged Data Preview:")
+                    st.dataframe(merged_data)
 
-                # Save merged file
-                output = BytesIO()
-                with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                    merged_data.to_excel(writer, index=False, sheet_name='Merged Data')
+                    # Save merged file
+                    output = BytesIO()
+                    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+                        merged_data.to_excel(writer, index=False, sheet_name='Merged Data')
 
-                output.seek(0)
+                    output.seek(0)
 
+            if output is not None:
                 # Provide download link for the merged file
                 st.download_button(
                     label="Download Merged Excel File",
@@ -0,0 +1,59 @@
+import numpy as np
+from fuzzywuzzy import fuzz
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from college_index import normalize_name
+
+DEFAULT_TOP_K = 5  # TF-IDF candidates re-scored with token_sort_ratio per name
+MAX_CHUNK_CELLS = 8_000_000  # Bound on (names per chunk) x (size of list B), i.e. ~32 MB of similarities
+
+
+# Nearest-neighbour matcher over a fixed list of names (list B): the character n-gram TF-IDF model
+# is fitted once, candidates for many names come from one sparse product per chunk,
+# and only those candidates are scored with fuzz.token_sort_ratio
+class NameMatcher:
+    def __init__(self, names):
+        self.names = ["" if name is None else str(name) for name in names]
+        self.vectorizer = TfidfVectorizer(analyzer="char_wb", ngram_range=(2, 4), dtype=np.float32)
+        # Transposed once, so each chunk is a single (chunk x features) @ (features x names) product
+        self.matrix_t = self.vectorizer.fit_transform([normalize_name(name) for name in self.names]).T.tocsr()
+
+    # Function to pick the number of names per chunk so the similarity block stays bounded
+    def chunk_rows(self):
+        return max(1, MAX_CHUNK_CELLS // max(1, len(self.names)))
+
+    # Function to get the top k candidates (indices into list B and cosine similarities) of a chunk of names
+    def top_candidates(self, names, k=DEFAULT_TOP_K):
+        k = min(k, len(self.names))
+        similarities = (self.vectorizer.transform([normalize_name(name) for name in names]) @ self.matrix_t).toarray()
+        if k < len(self.names):
+            top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(len(self.names)), (len(names), 1))
+        top_similarities = np.take_along_axis(similarities, top, axis=1)
+        order = np.argsort(-top_similarities, axis=1)  # Best candidate first
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_similarities, order, axis=1)
+
+    # Function to match names against list B, yielding one (index in list B or None, score, cosine similarity)
+    # per name, chunk by chunk; on_progress(done, total) is called after every chunk
+    def iter_matches(self, names, k=DEFAULT_TOP_K, on_progress=None):
+        names = ["" if name is None or name != name else str(name) for name in names]  # name != name catches NaN
+        step = self.chunk_rows()
+        for start in range(0, len(names), step):
+            chunk = names[start:start + step]
+            candidates, similarities = self.top_candidates(chunk, k)
+            for name, row_candidates, row_similarities in zip(chunk, candidates, similarities):
+                best = (None, 0, 0.0)
+                for index, similarity in zip(row_candidates, row_similarities):
+                    if similarity <= 0:
+                        break  # No shared n-grams with this or any later candidate
+                    score = fuzz.token_sort_ratio(name, self.names[index])
+                    if score > best[1]:
+                        best = (int(index), score, float(similarity))
+                yield best
+            if on_progress:
+                on_progress(min(start + step, len(names)), len(names))
+
+    # Function to match every name, returning a list of (index in list B or None, score, cosine similarity)
+    def match(self, names, k=DEFAULT_TOP_K, on_progress=None):
+        return list(self.iter_matches(names, k, on_progress))
@@ -0,0 +1,159 @@
+import argparse
+import hashlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pyarrow.feather as feather
+
+from college_export import DERIVED_COLUMNS
+from spell_engine import SpellEngine, build_domain_whitelist
+from template_store import load_template, template_hash
+
+PRECORRECTED_DIR = os.path.join(".cache", "precorrected")
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+DEFAULT_CHUNK_SIZE = 500  # Distinct texts per worker task
+
+
+def precorrected_path(content_hash):
+    return os.path.join(PRECORRECTED_DIR, f"template_{content_hash[:16]}.feather")
+
+
+def diff_path(content_hash):
+    return os.path.join(PRECORRECTED_DIR, f"diff_{content_hash[:16]}.csv")
+
+
+# Function to get the store of cell hash -> corrected text for a whitelist, kept across template versions
+# Corrections depend on the whitelist too, so a template whose whitelist changed starts a fresh store
+def cell_store_path(whitelist):
+    whitelist_hash = hashlib.sha1("\n".join(sorted(whitelist)).encode("utf-8")).hexdigest()
+    return os.path.join(PRECORRECTED_DIR, f"corrected_cells_{whitelist_hash[:16]}.feather")
+
+
+# Function to hash a cell's text, so unchanged cells can be recognized in later template versions
+def cell_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+# Function to write a frame as an uncompressed Feather file, atomically
+def write_feather(df, path):
+    tmp_file = f"{path}.{os.getpid()}.tmp"
+    feather.write_feather(df, tmp_file, compression="uncompressed")
+    os.replace(tmp_file, path)
+
+
+_worker_engine = None  # Spell engine built once per worker process
+
+
+def _init_worker(whitelist):
+    global _worker_engine
+    _worker_engine = SpellEngine(whitelist)
+
+
+def _correct_chunk(texts):
+    return _worker_engine.correct_series(texts).tolist()
+
+
+# Function to load the corrections of earlier runs with the same whitelist as cell hash -> corrected text
+def load_cell_store(whitelist):
+    path = cell_store_path(whitelist)
+    if not os.path.exists(path):
+        return {}
+    store = feather.read_table(path).to_pandas()
+    return dict(zip(store["cell_hash"], store["corrected"]))
+
+
+# Function to spell-correct every text cell of the template in a process pool
+# Writes the corrected template and a cell-level diff; cells whose text was corrected in an earlier run are reused
+def precorrect_template(workers=DEFAULT_WORKERS, chunk_size=DEFAULT_CHUNK_SIZE, log=print):
+    started = time.time()
+    df = load_template().drop(columns=DERIVED_COLUMNS, errors="ignore")
+    content_hash = template_hash()
+
+    # Text cells as (column position, row position, text, hash)
+    cells = []
+    for j in range(df.shape[1]):
+        for i, value in enumerate(df.iloc[:, j].tolist()):
+            if isinstance(value, str):
+                cells.append((j, i, value, cell_hash(value)))
+
+    whitelist = build_domain_whitelist(df)
+    store = load_cell_store(whitelist)
+    todo = {}  # Hash -> text, for the distinct texts not corrected before
+    for _, _, text, text_hash in cells:
+        if text_hash not in store:
+            todo.setdefault(text_hash, text)
+    log(f"{len(cells)} text cells, {len(set(c[3] for c in cells))} distinct; {len(todo)} to correct")
+
+    if todo:
+        hashes = list(todo)
+        chunks = [hashes[start:start + chunk_size] for start in range(0, len(hashes), chunk_size)]
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(whitelist,),
+        ) as executor:
+            results = executor.map(_correct_chunk, [[todo[h] for h in chunk] for chunk in chunks])
+            for done, (chunk, corrected) in enumerate(zip(chunks, results), start=1):
+                store.update(zip(chunk, corrected))
+                log(f"Corrected chunk {done}/{len(chunks)}")
+
+    # Corrected template, with the same rows and columns as the template
+    corrected_df = df.astype(object)
+    columns = {}  # Column position -> values with the corrections filled in
+    diff_rows = []
+    for j, i, text, text_hash in cells:
+        corrected = store[text_hash]
+        columns.setdefault(j, corrected_df.iloc[:, j].tolist())[i] = corrected
+        if corrected != text:
+            diff_rows.append({
+                "Row": i,
+                "College Name": df['College Name'].iat[i],
+                "Column": df.columns[j],
+                "Original": text,
+                "Corrected": corrected,
+            })
+    for j, values in columns.items():
+        corrected_df.isetitem(j, values)
+
+    os.makedirs(PRECORRECTED_DIR, exist_ok=True)
+    write_feather(corrected_df, precorrected_path(content_hash))
+    pd.DataFrame(diff_rows, columns=["Row", "College Name", "Column", "Original", "Corrected"]).to_csv(diff_path(content_hash), index=False)
+    # Keep only the cells of the current template, so the store does not grow with every version
+    current_hashes = sorted({text_hash for _, _, _, text_hash in cells})
+    store_file = cell_store_path(whitelist)
+    write_feather(
+        pd.DataFrame({"cell_hash": current_hashes, "corrected": [store[h] for h in current_hashes]}),
+        store_file,
+    )
+    # Stores of earlier whitelists would never be read again
+    for file_name in os.listdir(PRECORRECTED_DIR):
+        path = os.path.join(PRECORRECTED_DIR, file_name)
+        if file_name.startswith("corrected_cells") and file_name.endswith(".feather") and path != store_file:
+            os.remove(path)
+
+    log(f"{len(diff_rows)} cells changed; wrote {precorrected_path(content_hash)} in {time.time() - started:.1f}s")
+    return precorrected_path(content_hash)
+
+
+# Function to load the pre-corrected template of the given template version, or None if it was not built yet
+def load_precorrected(content_hash):
+    path = precorrected_path(content_hash)
+    if not os.path.exists(path):
+        return None
+    return feather.read_table(path, memory_map=True).to_pandas()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Spell-correct every text cell of the college template ahead of time.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Worker processes")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Distinct texts per worker task")
+    args = parser.parse_args()
+    precorrect_template(workers=args.workers, chunk_size=args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
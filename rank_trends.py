@@ -0,0 +1,98 @@
+import re
+
+import pandas as pd
+
+from josaa_store import KEY_COLUMNS
+
+RANK_COLUMNS = ['Opening Rank', 'Closing Rank']
+PREPARATORY_COLUMNS = ['Opening Preparatory', 'Closing Preparatory']
+YEAR_PATTERN = re.compile(r"(?<!\d)(20\d{2})(?!\d)")
+ROUND_PATTERN = re.compile(r"round[\s_-]*(\d+)", re.IGNORECASE)
+
+
+# Function to guess the year and round of a JoSAA file from its name, e.g. "josaa_2023_round_6.xlsx"
+# Returns (year or None, round or None)
+def infer_year_round(file_name):
+    year = YEAR_PATTERN.search(file_name)
+    round_number = ROUND_PATTERN.search(file_name)
+    return (int(year.group(1)) if year else None, int(round_number.group(1)) if round_number else None)
+
+
+# Function to convert ranks to numbers; preparatory-list ranks carry a "P" suffix, which is stripped
+# Returns (numeric ranks, whether each rank was preparatory)
+def parse_ranks(values):
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype("float32"), pd.Series(False, index=values.index)
+    text = values.astype("string").str.strip()
+    preparatory = text.str.upper().str.endswith("P").fillna(False).astype(bool)
+    ranks = pd.to_numeric(text.str.rstrip("pP"), errors="coerce").astype("float32")
+    return ranks, preparatory
+
+
+# Function to combine any number of JoSAA years (and rounds) into one long table
+# entries are (year, round, frame indexed by KEY_COLUMNS as returned by josaa_store.load_josaa);
+# a "Round" column inside a file takes precedence over the round given for it
+def build_long_table(entries):
+    parts = []
+    for year, round_number, df in entries:
+        part = df.reset_index()
+        part['Year'] = year
+        if 'Round' in part.columns:
+            part['Round'] = pd.to_numeric(part['Round'], errors="coerce").fillna(round_number or 0)
+        else:
+            part['Round'] = round_number or 0
+        # The flags are kept apart: a seat can open on the preparatory list and still close on the main one
+        part['Opening Rank'], part['Opening Preparatory'] = parse_ranks(part['Opening Rank'])
+        part['Closing Rank'], part['Closing Preparatory'] = parse_ranks(part['Closing Rank'])
+        parts.append(part[KEY_COLUMNS + ['Year', 'Round'] + RANK_COLUMNS + PREPARATORY_COLUMNS])
+
+    # Categories differ between files; giving every part the union of them keeps the concatenated keys categorical
+    for col in KEY_COLUMNS[1:]:
+        categories = sorted(set().union(*(part[col].cat.categories for part in parts)))
+        for part in parts:
+            part[col] = part[col].cat.set_categories(categories)
+    long_df = pd.concat(parts, ignore_index=True)
+    long_df['Year'] = long_df['Year'].astype("int16")
+    long_df['Round'] = long_df['Round'].astype("int8")
+    return long_df.sort_values(KEY_COLUMNS + ['Year', 'Round'], kind="stable").set_index(KEY_COLUMNS)
+
+
+# Function to keep one round per key and year: the given round_number, or the last round available for that year
+# Returns flat rows (the key as columns), still sorted by key and year
+def final_rounds(long_df, round_number=None):
+    df = long_df.reset_index()
+    if round_number is not None:
+        df = df[df['Round'] == round_number]
+    # Rows are sorted by key, year and round, so the last row of each (key, year) is its final round
+    return df.drop_duplicates(KEY_COLUMNS + ['Year'], keep="last")
+
+
+# Function to compute the year-over-year trend of every (college, course, quota, seat type, gender) group at once
+# Each year contributes one round (see final_rounds). Changes are against the group's previous available year;
+# volatility is the standard deviation of the closing rank's percent changes across the group's years
+def compute_trends(long_df, round_number=None):
+    df = final_rounds(long_df, round_number)
+    df[RANK_COLUMNS] = df[RANK_COLUMNS].astype("float64")  # Stored as float32; changes are computed at full precision
+
+    groups = df.groupby(KEY_COLUMNS, observed=True, sort=False)
+    for col in RANK_COLUMNS:
+        df[f'{col} Change'] = groups[col].diff()
+        df[f'{col} % Change'] = (groups[col].pct_change(fill_method=None) * 100).round(2)
+    df['Closing Rank Volatility'] = groups['Closing Rank % Change'].transform("std").round(2)
+    df['Years'] = groups['Year'].transform("size").astype("int16")
+    return df.set_index(KEY_COLUMNS)
+
+
+# Function to summarize each group's trend in one row: first and latest year, overall change and volatility
+def summarize_trends(trends):
+    groups = trends.groupby(level=KEY_COLUMNS, observed=True, sort=False)
+    summary = pd.DataFrame({
+        'First Year': groups['Year'].first(),
+        'Latest Year': groups['Year'].last(),
+        'First Closing Rank': groups['Closing Rank'].first(),
+        'Latest Closing Rank': groups['Closing Rank'].last(),
+        'Closing Rank Volatility': groups['Closing Rank Volatility'].last(),
+    })
+    summary['Closing Rank Change'] = summary['Latest Closing Rank'] - summary['First Closing Rank']
+    summary['Closing Rank % Change'] = (summary['Closing Rank Change'] / summary['First Closing Rank'] * 100).round(2)
+    return summary
@@ -1,12 +1,24 @@
 import streamlit as st
 import pandas as pd
 import requests
-from bs4 import BeautifulSoup
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque
 import datetime
+import hashlib
+import json
+import multiprocessing
+import os
 import urllib.parse
-import time
-from urllib.parse import urlparse
+from serp_fetch import FetchEngine
+from serp_parser import parse_serp_html
+from serp_cache import make_cache_key, open_cache
+from domain_matcher import get_matcher
+from job_runner import show_jobs, submit_job
+
+GURGAON_UULE = "w+CAIQICIwMjguNDU5NSAwNzcuMDI2Ng"  # Gurgaon coordinates
+LIVE_TABLE_ROWS = 200  # Only the most recent rows are rendered while a run is in progress
+RUNS_DIR = os.path.join(".cache", "ranktracker_runs")  # Completed and interrupted runs, one folder per input fingerprint
 
 # Function to process uploaded file and handle case-insensitive columns
 def process_uploaded_file(uploaded_file):
@@ -24,66 +36,95 @@ def process_uploaded_file(uploaded_file):
         st.error(f"Error processing file: {e}")
         return None
 
-# Function to scrape Google SERP using ScraperAPI
-def scrape_google(keyword, site_search=None):
-    SCRAPERAPI_KEY = st.secrets["SCRAPERAPI_KEY"]  # Get ScraperAPI key from Streamlit secrets
+# Function to read the ScraperAPI key from Streamlit secrets once per process
+@st.cache_resource
+def get_scraperapi_key():
+    return st.secrets["SCRAPERAPI_KEY"]
+
+# Function to build the shared fetch engine (keep-alive pool, global rate limit, retries)
+# One engine per process; the sliders reconfigure it instead of creating (and leaking) a session per setting
+@st.cache_resource
+def get_fetch_engine():
+    return FetchEngine()
+
+# Function to scrape Google SERP using ScraperAPI, served from the shared SERP cache when possible
+def scrape_google(keyword, site_search=None, engine=None, api_key=None, cache=None):
+    SCRAPERAPI_KEY = api_key or get_scraperapi_key()
+    engine = engine or get_fetch_engine()
+    cache = cache or open_cache()
     query = urllib.parse.quote_plus(keyword)
     if site_search:
         query = f"site:{site_search} {query}"
-    api_url = f"http://api.scraperapi.com/?api_key={SCRAPERAPI_KEY}&url=https://www.google.com/search?q={query}&num=100&gl=in&hl=en&device=mobile&uule=w+CAIQICIwMjguNDU5NSAwNzcuMDI2Ng"  # Gurgaon coordinates
+    api_url = f"http://api.scraperapi.com/?api_key={SCRAPERAPI_KEY}&url=https://www.google.com/search?q={query}&num=100&gl=in&hl=en&device=mobile&uule={GURGAON_UULE}"
+
+    # Runs in worker threads, so failures are returned as None and reported by the caller
+    def fetch():
+        try:
+            response = engine.get(api_url)  # Rate limiting and retries are handled by the engine
+            if response.status_code == 200:
+                return response.text
+        except requests.RequestException:
+            pass
+        return None
+
+    cache_query = f"site:{site_search} {keyword}" if site_search else keyword
+    cache_key = make_cache_key("scraperapi", cache_query, gl="in", hl="en", device="mobile", uule=GURGAON_UULE)
+    return cache.get_or_fetch(cache_key, fetch)
 
+# Function to build the process pool that parses SERP pages off the Streamlit thread
+@st.cache_resource
+def get_parse_pool(workers=None):
+    # Spawned workers avoid forking the multi-threaded Streamlit server
+    return ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=multiprocessing.get_context("spawn"))
+
+# Function to fetch a keyword in a worker thread and hand its HTML to the parse pool
+# The thread waits on the parse without holding the GIL, so fetching and parsing overlap
+def scrape_and_parse(keyword, parse_pool, engine=None, api_key=None, cache=None):
+    html = scrape_google(keyword, engine=engine, api_key=api_key, cache=cache)
+    if not html:
+        return None
     try:
-        time.sleep(2)  # Add delay to avoid overloading ScraperAPI
-        response = requests.get(api_url, timeout=30)
-        st.write(f"Scraping Keyword: {keyword}")  # Debug
-        st.write(f"Response Status Code: {response.status_code}")  # Debug
-        if response.status_code == 200:
-            return response.text
-        else:
-            st.warning(f"Failed to fetch data for keyword: {keyword}")
-            st.write(response.text[:500])  # Debug: Print response content
-    except requests.RequestException as e:
-        st.error(f"Error fetching data: {e}")
-    return None
+        return parse_pool.submit(parse_serp_html, html).result()
+    except BrokenProcessPool:
+        raise  # The pool itself is gone, which fails the whole run
+    except Exception:
+        return None  # A page that cannot be parsed fails only its keyword
 
-# Function to extract rankings
+# Function to extract rankings from an HTML page
 def extract_ranking(html, keyword, primary_domain, primary_url, competitors):
-    soup = BeautifulSoup(html, "html.parser")
-    search_results = soup.find_all("div", class_="tF2Cxc")  # Google SERP search result container
-    st.write(f"HTML Parsed Results: {len(search_results)} found.")  # Debug
-    rank_counter = 0
+    records = parse_serp_html(html)
+    return rank_serp_records(records, keyword, primary_domain, primary_url, competitors)
+
+# Function to compute rankings from parsed (rank, url, domain) records
+def rank_serp_records(records, keyword, primary_domain, primary_url, competitors):
     primary_rank = None
     primary_ranking_url = None
     competitor_ranks = {comp: None for comp in competitors}  # Initialize all competitors with None
     best_url_rank = None
     best_url = None
+    primary_matcher = get_matcher((primary_domain,))
+    competitor_matcher = get_matcher(tuple(competitors))
 
-    for result in search_results:
-        rank_counter += 1
-        link_element = result.find("a")
-        if link_element:
-            link = link_element["href"]
-            domain = urlparse(link).netloc.lower()
-
-            # Check for primary URL or domain
-            if primary_url and primary_url in link and not primary_rank:
-                primary_rank = rank_counter
-                primary_ranking_url = link
-            elif primary_domain in domain and not primary_rank:
-                primary_rank = rank_counter
-                primary_ranking_url = link
-
-            # Check for competitor rankings
-            for comp in competitors:
-                if comp in domain:
-                    # Keep the best-ranked URL for the competitor
-                    if competitor_ranks[comp] is None or rank_counter < competitor_ranks[comp]["Rank"]:
-                        competitor_ranks[comp] = {"Competitor": comp, "Rank": rank_counter, "URL": link}
-
-            # Track the best URL
-            if not best_url_rank or rank_counter < best_url_rank:
-                best_url_rank = rank_counter
-                best_url = link
+    for rank_counter, link, domain in records:
+        # Check for primary URL or domain
+        if primary_url and primary_url in link and not primary_rank:
+            primary_rank = rank_counter
+            primary_ranking_url = link
+        elif primary_matcher.match(domain) and not primary_rank:
+            primary_rank = rank_counter
+            primary_ranking_url = link
+
+        # Check for competitor rankings (registrable-domain lookup, not substring tests)
+        for comp in competitor_matcher.match(domain):
+            if comp in competitor_ranks:
+                # Keep the best-ranked URL for the competitor
+                if competitor_ranks[comp] is None or rank_counter < competitor_ranks[comp]["Rank"]:
+                    competitor_ranks[comp] = {"Competitor": comp, "Rank": rank_counter, "URL": link}
+
+        # Track the best URL
+        if not best_url_rank or rank_counter < best_url_rank:
+            best_url_rank = rank_counter
+            best_url = link
 
     # Convert competitor_ranks to a list, replacing None with null entries
     competitors_list = [v if v else {"Competitor": comp, "Rank": None, "URL": None} for comp, v in competitor_ranks.items()]
@@ -98,27 +139,198 @@ def extract_ranking(html, keyword, primary_domain, primary_url, competitors):
     }
 
 # Function to get crawled URL if primary rank is None
-def fetch_crawled_url(primary_domain):
-    html = scrape_google("", site_search=primary_domain)
-    if html:
-        soup = BeautifulSoup(html, "html.parser")
-        search_results = soup.find_all("div", class_="tF2Cxc")
-        if search_results:
-            link_element = search_results[0].find("a")
-            if link_element:
-                crawled_url = link_element["href"]
-                st.write(f"Crawled URL for domain {primary_domain}: {crawled_url}")  # Debug statement
-                return crawled_url
-    st.write(f"No crawled URL found for domain {primary_domain}.")  # Debug statement
+def fetch_crawled_url(primary_domain, engine=None, api_key=None, cache=None):
+    html = scrape_google("", site_search=primary_domain, engine=engine, api_key=api_key, cache=cache)
+    records = parse_serp_html(html)
+    if records:
+        return records[0][1]
     return None
 
+# Function to list the output columns for a run (fixed per run so rows can be appended)
+def result_columns(competitors):
+    columns = ["Keyword", "Primary Rank", "Primary URL", "Best URL Rank", "Best URL", "Crawled URL"]
+    for comp in competitors:
+        columns += [f"{comp} Rank", f"{comp} URL"]
+    return columns
+
+# Function to flatten a ranking result into a single output row
+def flatten_result(res):
+    entry = {
+        "Keyword": res["Keyword"],
+        "Primary Rank": res["Primary Rank"],
+        "Primary URL": res["Primary URL"],
+        "Best URL Rank": res["Best URL Rank"],
+        "Best URL": res["Best URL"],
+        "Crawled URL": res.get("Crawled URL"),
+    }
+    for comp in res["Competitors"]:
+        entry[f"{comp['Competitor']} Rank"] = comp["Rank"]
+        entry[f"{comp['Competitor']} URL"] = comp["URL"]
+    return entry
+
+# Function to scrape keywords one batch at a time, yielding (batch_size, rows, failed_keywords) per batch
+# Rows keep the input order within each batch
+def iter_ranking_batches(keywords_and_urls, primary_domain, competitors, batch_size, max_workers, engine, api_key, cache, parse_pool):
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for start in range(0, len(keywords_and_urls), batch_size):
+            batch = keywords_and_urls[start:start + batch_size]
+            futures = [
+                executor.submit(scrape_and_parse, keyword, parse_pool, engine=engine, api_key=api_key, cache=cache)
+                for keyword, _ in batch
+            ]
+            rows = []
+            failed_keywords = []
+            for (keyword, primary_url), future in zip(batch, futures):
+                records = future.result()
+                if records is None:
+                    failed_keywords.append(keyword)
+                    continue
+                result = rank_serp_records(records, keyword, primary_domain, primary_url, competitors)
+                if result["Primary Rank"] is None:  # Fetch crawled URL if primary rank is not found
+                    result["Crawled URL"] = fetch_crawled_url(primary_domain, engine=engine, api_key=api_key, cache=cache)
+                rows.append(flatten_result(result))
+            yield len(batch), rows, failed_keywords
+
+# Function to append a batch of rows to the CSV output, writing the header on first use
+def append_rows(output_file, rows, columns):
+    pd.DataFrame(rows, columns=columns).to_csv(
+        output_file, mode="a", header=not os.path.exists(output_file), index=False
+    )
+
+# Background job entry point (see job_runner.JOB_TARGETS); runs without a Streamlit session
+def run_ranking_job(job, keywords_and_urls, primary_domain, competitors, batch_size, max_workers, requests_per_second, cache_ttl_hours, api_key):
+    engine = FetchEngine(max_concurrency=max_workers, requests_per_second=requests_per_second)
+    cache = open_cache().with_ttl(int(cache_ttl_hours) * 3600)
+    columns = result_columns(competitors)
+    output_file = job.result_path("SERP_Ranking_Results.csv")
+    failed_count = 0
+    done = 0
+    job.report_progress(done, len(keywords_and_urls))
+
+    with ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn")) as parse_pool:
+        batches = iter_ranking_batches(
+            keywords_and_urls, primary_domain, competitors, batch_size, max_workers, engine, api_key, cache, parse_pool
+        )
+        for batch_count, rows, batch_failures in batches:
+            if rows:
+                append_rows(output_file, rows, columns)
+            done += batch_count
+            failed_count += len(batch_failures)
+            job.report_progress(done, len(keywords_and_urls), message=f"{failed_count} keywords failed" if failed_count else None)
+
+    if not os.path.exists(output_file):
+        raise RuntimeError("No ranking data found.")
+    return output_file
+
+# Function to fingerprint the inputs that determine a run's results
+def input_fingerprint(keywords_and_urls, primary_domain, competitors):
+    payload = json.dumps([list(map(str, pair)) for pair in keywords_and_urls] + [primary_domain, sorted(competitors)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+# Function to load the stored run for a fingerprint, or None if there is none
+def load_run(fingerprint):
+    run_file = os.path.join(RUNS_DIR, fingerprint, "run.json")
+    if not os.path.exists(run_file):
+        return None
+    with open(run_file) as f:
+        return json.load(f)
+
+# Function to persist a run's checkpoint atomically so an interrupted write never corrupts it
+def save_run(run):
+    run_dir = os.path.join(RUNS_DIR, run["fingerprint"])
+    os.makedirs(run_dir, exist_ok=True)
+    tmp_file = os.path.join(run_dir, f"run.json.{os.getpid()}.tmp")
+    with open(tmp_file, "w") as f:
+        json.dump(run, f)
+    os.replace(tmp_file, os.path.join(run_dir, "run.json"))
+    st.session_state.ranktracker_runs[run["fingerprint"]] = run
+
+# Function to create a fresh run for a fingerprint, discarding any earlier results for the same inputs
+def create_run(fingerprint, total_keywords, columns):
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    run = {
+        "run_id": f"{timestamp}_{fingerprint[:8]}",
+        "fingerprint": fingerprint,
+        "total": total_keywords,
+        "completed": 0,  # Keywords are processed in input order, so this is the resume offset
+        "failed_keywords": [],
+        "columns": columns,
+        "status": "running",
+        "output_file": os.path.join(RUNS_DIR, fingerprint, f"SERP_Ranking_Results_{timestamp}.csv"),
+    }
+    old_run = load_run(fingerprint)
+    if old_run and os.path.exists(old_run["output_file"]):
+        os.remove(old_run["output_file"])
+    save_run(run)
+    return run
+
+# Function to crawl the keywords a run has not completed yet, checkpointing after every batch
+def execute_run(run, keywords_and_urls, primary_domain, competitors, batch_size, max_workers, engine, api_key, cache):
+    total_keywords = run["total"]
+    columns = run["columns"]
+
+    # A single progress bar and a bounded live table keep the page size flat on large runs
+    progress_bar = st.progress(run["completed"] / total_keywords, text=f"Processed {run['completed']}/{total_keywords} keywords.")
+    live_table = st.empty()
+    recent_rows = deque(maxlen=LIVE_TABLE_ROWS)
+
+    # Scraping process: threads fetch, the process pool parses, each batch is appended to disk
+    parse_pool = get_parse_pool()
+    batches = iter_ranking_batches(
+        keywords_and_urls[run["completed"]:], primary_domain, competitors, batch_size, max_workers, engine, api_key, cache, parse_pool
+    )
+    try:
+        for batch_count, rows, batch_failures in batches:
+            if rows:
+                append_rows(run["output_file"], rows, columns)
+                recent_rows.extend(rows)
+                live_table.dataframe(pd.DataFrame(list(recent_rows), columns=columns))
+            run["failed_keywords"].extend(batch_failures)
+            run["completed"] += batch_count
+            save_run(run)
+            progress_bar.progress(run["completed"] / total_keywords, text=f"Processed {run['completed']}/{total_keywords} keywords.")
+    except BrokenProcessPool:
+        get_parse_pool.clear()  # Start fresh workers on the next attempt
+        live_table.empty()
+        st.error("A parser process stopped unexpectedly. The finished batches are saved; resume to continue from there.")
+        return
+
+    run["status"] = "completed"
+    save_run(run)
+    live_table.empty()
+
+# Function to render a stored run from disk without touching the network
+def render_run(run):
+    if run["status"] != "completed":
+        st.info(f"Run {run['run_id']} stopped after {run['completed']}/{run['total']} keywords. Resume to continue from there.")
+    if run["failed_keywords"]:
+        failed_keywords = run["failed_keywords"]
+        st.warning(f"Failed to fetch data for {len(failed_keywords)} keywords: {', '.join(failed_keywords[:20])}")
+
+    # Offer the streamed results file for download
+    if os.path.exists(run["output_file"]):
+        if run["status"] == "completed":
+            st.success("Scraping Completed!")
+        st.write("### Results Table:")
+        st.dataframe(pd.read_csv(run["output_file"]))
+        st.write("Download Results Below:")
+        with open(run["output_file"], "rb") as file:
+            st.download_button(
+                label="Download Results",
+                data=file,
+                file_name=os.path.basename(run["output_file"]),
+                mime="text/csv",
+            )
+    elif run["status"] == "completed":
+        st.warning("No ranking data found.")
+
 # Streamlit App
 def main():
     st.title("Google SERP Ranking Scraper")
     st.write("Upload a file or paste keywords to get rankings for a primary website and optional competitors.")
 
-    if "proceed_full_scraping" not in st.session_state:
-        st.session_state.proceed_full_scraping = False
+    if "ranktracker_runs" not in st.session_state:
+        st.session_state.ranktracker_runs = {}  # Input fingerprint -> run checkpoint
 
     # File upload or text input
     input_option = st.radio("Choose input method:", ("Upload Excel File", "Paste Keywords"))
@@ -145,8 +357,22 @@ def main():
     competitors = [comp.strip().lower() for comp in competitors_input.split(",") if comp.strip()]
 
     # Slider for parallel requests and batch size
-    max_workers = st.slider("Number of Parallel Requests", min_value=1, max_value=10, value=5)
-    batch_size = st.slider("Batch Size (Keywords per Request)", min_value=5, max_value=20, value=10)
+    max_workers = st.slider("Number of Parallel Requests", min_value=1, max_value=50, value=5)
+    requests_per_second = st.slider("Max Requests per Second", min_value=1, max_value=50, value=5)
+    cache_ttl_hours = st.number_input("Reuse cached SERPs for (hours)", min_value=0, max_value=720, value=24)
+    batch_size = st.slider("Batch Size (Keywords per Batch)", min_value=5, max_value=500, value=50)
+
+    engine = get_fetch_engine()
+    engine.configure(max_workers, requests_per_second)
+    api_key = get_scraperapi_key()
+    cache = open_cache().with_ttl(int(cache_ttl_hours) * 3600)
+
+    # Results are stored per input fingerprint; reruns render them instead of crawling again
+    fingerprint = input_fingerprint(keywords_and_urls, primary_domain, competitors) if keywords_and_urls else None
+    run = None
+    if fingerprint:
+        run = st.session_state.ranktracker_runs.get(fingerprint) or load_run(fingerprint)
+    crawl_args = (keywords_and_urls, primary_domain, competitors, batch_size, max_workers, engine, api_key, cache)
 
     if st.button("Start Scraping"):
         if not keywords_and_urls:
@@ -158,78 +384,28 @@ def main():
 
         # Process the first keyword as a sample
         first_keyword, primary_url = keywords_and_urls[0]
-        html = scrape_google(first_keyword)
+        html = scrape_google(first_keyword, engine=engine, api_key=api_key, cache=cache)
         if html:
             sample_result = extract_ranking(html, first_keyword, primary_domain, primary_url, competitors)
             st.write("Sample Result for First Keyword:")
             st.write(sample_result)
-            st.session_state.proceed_full_scraping = True
-
-    if st.session_state.proceed_full_scraping:
-        st.write("Proceeding with full scraping...")
-        results = []
-        total_keywords = len(keywords_and_urls)
-        processed_count = 0  # Counter for processed keywords
-
-        # Split into batches
-        keyword_batches = [keywords_and_urls[i:i + batch_size] for i in range(0, len(keywords_and_urls), batch_size)]
-
-        # Scraping process
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {
-                executor.submit(
-                    scrape_google, keyword
-                ): (keyword, primary_url) for keyword, primary_url in keywords_and_urls
-            }
-
-            for idx, future in enumerate(as_completed(futures)):
-                keyword, primary_url = futures[future]
-                html = future.result()
-                if html:
-                    result = extract_ranking(html, keyword, primary_domain, primary_url, competitors)
-                    if result["Primary Rank"] is None:  # Fetch crawled URL if primary rank is not found
-                        crawled_url = fetch_crawled_url(primary_domain)
-                        result["Crawled URL"] = crawled_url
-                    results.append(result)
-                    processed_count += 1
-                    st.write(f"Processed {processed_count}/{total_keywords} keywords.", end="\r", flush=True)
-
-        # Display results in a table
-        if results:
-            flat_results = []
-            for res in results:
-                entry = {
-                    "Keyword": res["Keyword"],
-                    "Primary Rank": res["Primary Rank"],
-                    "Primary URL": res["Primary URL"],
-                    "Best URL Rank": res["Best URL Rank"],
-                    "Best URL": res["Best URL"],
-                    "Crawled URL": res.get("Crawled URL"),
-                }
-                for comp in res["Competitors"]:
-                    entry[f"{comp['Competitor']} Rank"] = comp["Rank"]
-                    entry[f"{comp['Competitor']} URL"] = comp["URL"]
-                flat_results.append(entry)
-
-            results_df = pd.DataFrame(flat_results)
-            st.write("### Results Table:")
-            st.dataframe(results_df)
-
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_file = f"SERP_Ranking_Results_{timestamp}.xlsx"
-            results_df.to_excel(output_file, index=False)
-
-            st.success("Scraping Completed!")
-            st.write("Download Results Below:")
-            with open(output_file, "rb") as file:
-                st.download_button(
-                    label="Download Results",
-                    data=file,
-                    file_name=output_file,
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                )
+            st.write("Proceeding with full scraping...")
+            run = create_run(fingerprint, len(keywords_and_urls), result_columns(competitors))
+            execute_run(run, *crawl_args)
         else:
-            st.warning("No ranking data found.")
+            st.warning(f"Failed to fetch data for keyword: {first_keyword}")
+    elif run and run["status"] != "completed" and primary_domain and st.button("Resume Scraping"):
+        execute_run(run, *crawl_args)
+
+    if run:
+        render_run(run)
+
+    # Long runs can be queued in a background worker instead of holding this page open
+    if keywords_and_urls and primary_domain and st.button("Run in Background"):
+        job_args = (keywords_and_urls, primary_domain, competitors, batch_size, max_workers, requests_per_second, cache_ttl_hours, api_key)
+        submit_job("ranktracker", job_args, description=f"{primary_domain} ({len(keywords_and_urls)} keywords)")
+        st.success("Scraping queued. Track its progress below.")
+    show_jobs("ranktracker")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+from rank_trends import final_rounds
+
+GROUP_COLUMNS = ['Year', 'Quota', 'Seat Type', 'Gender']
+RESULT_COLUMNS = ['College ID', 'Course Name', 'Year', 'Opening Rank', 'Closing Rank']
+
+
+# Rank-to-seats lookup over the JoSAA long table: for every (year, quota, seat type, gender) the closing ranks
+# are kept sorted in one array, so a query is a binary search per year instead of a scan of the table
+class SeatPredictor:
+    def __init__(self, long_df, round_number=None):
+        df = final_rounds(long_df, round_number)
+        # A preparatory ("P") closing rank comes from a separate merit list, so it is not comparable with a candidate's
+        # rank; only the closing rank decides eligibility, so a preparatory opening rank does not exclude the seat
+        df = df[~df['Closing Preparatory'] & df['Closing Rank'].notna()]
+        df = df.sort_values(GROUP_COLUMNS + ['Closing Rank'], kind="stable")
+
+        self.closing_ranks = df['Closing Rank'].to_numpy("float64")
+        self.opening_ranks = df['Opening Rank'].to_numpy("float64")
+        self.college_ids = df['College ID'].to_numpy("int32")
+        self.courses = df['Course Name'].to_numpy(object)
+        self.row_years = df['Year'].to_numpy("int16")
+        # Rows of a group are contiguous after the sort: group -> (first row, end row)
+        self.groups = {
+            (int(key[0]),) + tuple(key[1:]): (rows[0], rows[-1] + 1)
+            for key, rows in df.groupby(GROUP_COLUMNS, observed=True, sort=False).indices.items()
+        }
+        self.years = sorted({key[0] for key in self.groups})
+        self.quotas = sorted({key[1] for key in self.groups})
+        self.seat_types = sorted({key[2] for key in self.groups})
+        self.genders = sorted({key[3] for key in self.groups})
+
+    # Function to get the rows (positions in the sorted arrays) a rank is eligible for, ordered by closing rank
+    # Eligible means the closing rank is at or above (numerically not below) the candidate's rank
+    def eligible_rows(self, rank, quota, seat_type, gender, years=None):
+        years = self.years[-1:] if years is None else years
+        rows = []
+        for year in years:
+            span = self.groups.get((int(year), quota, seat_type, gender))
+            if span is None:
+                continue
+            start, end = span
+            first = start + np.searchsorted(self.closing_ranks[start:end], rank, side="left")
+            rows.append(np.arange(first, end))
+        if not rows:
+            return np.empty(0, dtype=np.int64)
+        rows = np.concatenate(rows)
+        if len(years) > 1:
+            rows = rows[np.argsort(self.closing_ranks[rows], kind="stable")]
+        return rows
+
+    # Function to list every (college, course) a rank is eligible for in the chosen years (default: the latest year)
+    def query(self, rank, quota, seat_type, gender, years=None, limit=None):
+        rows = self.eligible_rows(rank, quota, seat_type, gender, years)[:limit]
+        return pd.DataFrame({
+            'College ID': self.college_ids[rows],
+            'Course Name': self.courses[rows],
+            'Year': self.row_years[rows],
+            'Opening Rank': self.opening_ranks[rows],
+            'Closing Rank': self.closing_ranks[rows],
+        }, columns=RESULT_COLUMNS)
@@ -0,0 +1,135 @@
+import functools
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "serp_cache.sqlite")
+DEFAULT_TTL_SECONDS = 24 * 3600
+MAX_TTL_SECONDS = 720 * 3600  # Longest reuse window the pages offer; older entries are evicted
+DEFAULT_MAX_ENTRIES = 50000
+EVICT_EVERY = 100  # Run eviction once per this many writes
+
+
+# Function to normalize a search query so trivially different spellings share a cache entry
+def normalize_query(query):
+    return " ".join(str(query).lower().split())
+
+
+# Function to build the cache key from the query and the Google locale parameters
+def make_cache_key(namespace, query, gl=None, hl=None, device=None, uule=None):
+    parts = [namespace, normalize_query(query), gl or "", hl or "", device or "", uule or ""]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+# SQLite-backed response cache with per-call TTL, size-bounded eviction and in-flight de-duplication
+# One instance per database file serves every TTL, so all callers share one connection and one in-flight map
+class SerpCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES, max_age_seconds=MAX_TTL_SECONDS):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.max_age_seconds = max_age_seconds
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.in_flight = {}  # Cache key -> Event set when the owning fetch finishes
+        self.writes_since_evict = 0
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)")
+
+    # Function to return a value cached within the last ttl_seconds, or None if missing or older
+    def get(self, key, ttl_seconds=DEFAULT_TTL_SECONDS):
+        now = time.time()
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                "SELECT value FROM responses WHERE key = ? AND created_at >= ?", (key, now - ttl_seconds)
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def set(self, key, value):
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self.writes_since_evict += 1
+            due = self.writes_since_evict >= EVICT_EVERY
+        if due:
+            self.evict()
+
+    # Function to drop entries older than any caller may reuse and trim the least recently used ones beyond max_entries
+    def evict(self):
+        with self.lock, self.conn:
+            self.writes_since_evict = 0
+            self.conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.max_age_seconds,))
+            (count,) = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+            if count > self.max_entries:
+                self.conn.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed_at LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+
+    # Function to return the cached value or run fetch_fn once, even when several threads ask at the same time
+    def get_or_fetch(self, key, fetch_fn, ttl_seconds=DEFAULT_TTL_SECONDS):
+        value = self.get(key, ttl_seconds)
+        if value is not None:
+            return value
+
+        with self.lock:
+            event = self.in_flight.get(key)
+            is_owner = event is None
+            if is_owner:
+                event = self.in_flight[key] = threading.Event()
+
+        if not is_owner:
+            event.wait()
+            value = self.get(key, ttl_seconds)
+            if value is not None:
+                return value
+            return fetch_fn()  # The owning fetch failed; try on our own
+
+        try:
+            value = self.get(key, ttl_seconds)  # Another owner may have finished between our first lookup and the lock
+            if value is not None:
+                return value
+            value = fetch_fn()
+            if value is not None:  # Failed fetches are never cached
+                self.set(key, value)
+            return value
+        finally:
+            with self.lock:
+                self.in_flight.pop(key, None)
+            event.set()
+
+    # Function to get a view of this cache that reuses values for ttl_seconds, for callers that take a cache object
+    def with_ttl(self, ttl_seconds):
+        return TtlCache(self, ttl_seconds)
+
+
+# A SerpCache bound to one TTL; it shares the cache's connection and in-flight fetches
+class TtlCache:
+    def __init__(self, cache, ttl_seconds):
+        self.cache = cache
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, key):
+        return self.cache.get(key, self.ttl_seconds)
+
+    def get_or_fetch(self, key, fetch_fn):
+        return self.cache.get_or_fetch(key, fetch_fn, self.ttl_seconds)
+
+
+# Function to open the process-wide cache instance of a database file; the TTL is chosen per call
+@functools.lru_cache(maxsize=None)
+def open_cache(path=DEFAULT_CACHE_PATH):
+    return SerpCache(path)
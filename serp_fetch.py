@@ -0,0 +1,89 @@
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Status codes worth retrying: rate limiting and transient server errors
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+# Token-bucket rate limiter shared by every worker thread
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)  # Tokens added per second
+        self.capacity = float(capacity or max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    # Block until a token is available, then consume it
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# Pooled keep-alive session with a global rate limit and bounded concurrency
+class FetchEngine:
+    def __init__(self, max_concurrency=5, requests_per_second=5, max_retries=3, backoff_base=1.0, timeout=30):
+        self.session = requests.Session()
+        self.adapter = None
+        self.max_concurrency = None
+        self.requests_per_second = None
+        self.configure(max_concurrency, requests_per_second)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.timeout = timeout
+
+    # Function to change the concurrency and rate limit in place, so one engine (and one session) serves every setting
+    # Requests already in flight finish under the limits they started with
+    def configure(self, max_concurrency, requests_per_second):
+        if max_concurrency != self.max_concurrency:
+            adapter = HTTPAdapter(pool_connections=max_concurrency, pool_maxsize=max_concurrency)
+            self.session.mount("http://", adapter)
+            self.session.mount("https://", adapter)
+            if self.adapter is not None:
+                self.adapter.close()  # Drops the idle keep-alive connections; in-flight ones close when released
+            self.adapter = adapter
+            self.slots = threading.BoundedSemaphore(max_concurrency)
+            self.max_concurrency = max_concurrency
+        if requests_per_second != self.requests_per_second:
+            self.limiter = TokenBucket(requests_per_second)
+            self.requests_per_second = requests_per_second
+
+    # Function to GET a URL, retrying with jittered exponential backoff on 429/5xx and connection errors
+    def get(self, url, params=None):
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                # Full jitter keeps retrying workers from hitting the API in lockstep
+                time.sleep(random.uniform(0, self.backoff_base * (2 ** attempt)))
+            self.limiter.acquire()
+            try:
+                with self.slots:
+                    response = self.session.get(url, params=params, timeout=self.timeout)
+            except requests.RequestException as e:
+                last_error = e
+                continue
+            if response.status_code not in RETRY_STATUS_CODES:
+                return response
+            # Honour Retry-After from the API when it is given in seconds
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                time.sleep(int(retry_after))
+            last_error = None
+        if last_error is not None:
+            raise last_error
+        return response
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,36 @@
+from urllib.parse import urlparse
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml  # noqa: F401
+    PARSER = "lxml"
+except ImportError:
+    PARSER = "html.parser"
+
+RESULT_CLASS = "tF2Cxc"  # Google SERP search result container
+
+
+# Function to match the result container class while the page is still being tokenized
+# The strainer sees the raw class attribute, so multi-class values are split here
+def is_result_class(css_class):
+    return css_class is not None and RESULT_CLASS in css_class.split()
+
+
+# Only the organic result containers are built into the tree; the rest of the page is skipped
+RESULT_STRAINER = SoupStrainer("div", class_=is_result_class)
+
+
+# Function to parse a Google SERP into compact (rank, url, domain) records
+# Runs in worker processes, so it must stay importable and free of Streamlit calls
+def parse_serp_html(html):
+    records = []
+    if not html:
+        return records
+    soup = BeautifulSoup(html, PARSER, parse_only=RESULT_STRAINER)
+    for rank, result in enumerate(soup.find_all("div", class_=RESULT_CLASS), 1):
+        link_element = result.find("a", href=True)
+        if link_element:
+            link = link_element["href"]
+            records.append((rank, link, urlparse(link).netloc.lower()))
+    return records
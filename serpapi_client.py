@@ -0,0 +1,84 @@
+import threading
+
+import requests
+
+SERPAPI_SEARCH_URL = "https://serpapi.com/search.json"
+SERPAPI_ACCOUNT_URL = "https://serpapi.com/account.json"
+
+
+# Function to read how many searches are left on a SerpAPI key (None if the account API is unavailable)
+def fetch_searches_left(engine, api_key):
+    try:
+        response = engine.get(SERPAPI_ACCOUNT_URL, params={"api_key": api_key})
+        if response.status_code == 200:
+            return response.json().get("total_searches_left")
+    except (requests.RequestException, ValueError):
+        pass
+    return None
+
+
+# Per-key quota accounting shared by every worker thread
+class SerpApiKeyPool:
+    def __init__(self, api_keys):
+        self.api_keys = list(dict.fromkeys(api_keys))  # Drop duplicates, keep order
+        self.used = {key: 0 for key in self.api_keys}
+        self.remaining = {key: None for key in self.api_keys}  # None means "not known yet"
+        self.lock = threading.Lock()
+
+    # Function to refresh the remaining searches of every key from the account API
+    def refresh(self, engine):
+        for key in self.api_keys:
+            searches_left = fetch_searches_left(engine, key)
+            with self.lock:
+                self.remaining[key] = searches_left
+
+    # Function to reserve one search on the key with the most quota left, or None when all are exhausted
+    def acquire(self):
+        with self.lock:
+            available = [key for key in self.api_keys if self.remaining[key] is None or self.remaining[key] > 0]
+            if not available:
+                return None
+            key = max(available, key=lambda k: float("inf") if self.remaining[k] is None else self.remaining[k])
+            self.used[key] += 1
+            if self.remaining[key] is not None:
+                self.remaining[key] -= 1
+            return key
+
+    # Function to give a reserved search back when SerpAPI did not bill it
+    def release(self, key):
+        with self.lock:
+            self.used[key] -= 1
+            if self.remaining[key] is not None:
+                self.remaining[key] += 1
+
+    # Function to stop using a key that SerpAPI reports as out of searches
+    def mark_exhausted(self, key):
+        with self.lock:
+            self.remaining[key] = 0
+
+    # Function to summarize usage per key, with the keys masked for display
+    def summary(self):
+        with self.lock:
+            return [
+                {"API Key": f"...{key[-4:]}", "Searches Used": self.used[key], "Searches Left": self.remaining[key]}
+                for key in self.api_keys
+            ]
+
+
+# Function to run one SerpAPI search through the shared fetch engine, returning the JSON dict or None
+def search_serpapi(engine, key_pool, params):
+    api_key = key_pool.acquire()
+    if api_key is None:
+        return None
+    try:
+        response = engine.get(SERPAPI_SEARCH_URL, params={**params, "api_key": api_key})
+        results = response.json()
+    except (requests.RequestException, ValueError):
+        key_pool.release(api_key)
+        return None
+    if response.status_code != 200 or "error" in results:
+        key_pool.release(api_key)  # Failed searches are not billed
+        if response.status_code == 429:  # Out of searches (or still throttled after all retries)
+            key_pool.mark_exhausted(api_key)
+        return None
+    return results
@@ -1,41 +1,58 @@
 import streamlit as st
 import pandas as pd
-from serpapi import GoogleSearch
-from urllib.parse import urlparse
-
-# Function to get the base domain from a URL (to avoid matching issues due to query params)
-def get_base_domain(url):
-    if not url.startswith("http"):  # Handle cases where 'http' or 'https' is missing
-        url = "http://" + url  # Add a default scheme to ensure proper parsing
-    parsed_url = urlparse(url)
-    # Extract base domain, remove "www." if it exists
-    domain = parsed_url.netloc.replace('www.', '')
-    return domain
-
-# Function to get SERP rank using SerpAPI directly from JSON response
-def get_serp_rank_serpapi(keyword, target_websites, api_key):
+import json
+from concurrent.futures import ThreadPoolExecutor
+from serp_fetch import FetchEngine
+from serpapi_client import SerpApiKeyPool, search_serpapi
+from serp_cache import make_cache_key, open_cache
+from domain_matcher import get_matcher
+from job_runner import show_jobs, submit_job
+
+GURGAON_UULE = "w+CAIQICINV1JUwzBQbVlJMVyCF9ZYk9MQkFWTnA="  # Approximate location for Gurgaon
+
+# Function to build the shared fetch engine (keep-alive pool, global rate limit, retries)
+# One engine per process; the sliders reconfigure it instead of creating a session per setting
+@st.cache_resource
+def get_fetch_engine():
+    return FetchEngine()
+
+# Function to fetch the SerpAPI JSON for a keyword, served from the shared SERP cache when possible
+# Returns None if the search failed; cache hits do not use any SerpAPI quota
+def fetch_serpapi_results(keyword, engine, key_pool, cache=None):
+    cache = cache or open_cache()
     params = {
+        "engine": "google",
         "q": keyword,
         "num": 100,  # Get up to 100 results
         "device": "mobile",  # Use mobile search
         "gl": "in",  # Set location to India
         "hl": "en",  # Set language to English
-        "uule": "w+CAIQICINV1JUwzBQbVlJMVyCF9ZYk9MQkFWTnA=",  # Approximate location for Gurgaon
-        "api_key": api_key,
+        "uule": GURGAON_UULE,
     }
 
-    search = GoogleSearch(params)
-    results = search.get_dict()
+    def fetch():
+        results = search_serpapi(engine, key_pool, params)
+        if results is None:  # Do not cache API errors (bad key, exhausted credits, ...)
+            return None
+        return json.dumps(results)
+
+    cache_key = make_cache_key("serpapi", keyword, gl="in", hl="en", device="mobile", uule=GURGAON_UULE)
+    cached = cache.get_or_fetch(cache_key, fetch)
+    return json.loads(cached) if cached else None
+
+# Function to get SERP rank using SerpAPI directly from JSON response, or None if the search failed
+def get_serp_rank_serpapi(keyword, target_websites, engine, key_pool, cache=None):
+    results = fetch_serpapi_results(keyword, engine, key_pool, cache)
+    if results is None:
+        return None
 
     rankings = {website: None for website in target_websites}
+    matcher = get_matcher(tuple(target_websites))  # Target domains are normalized once, not per result
 
     if "organic_results" in results:
         for index, result in enumerate(results["organic_results"], 1):
-            link = result["link"]
-            base_link = get_base_domain(link)
-            for website in target_websites:
-                base_website = get_base_domain(website)
-                if base_website == base_link and rankings[website] is None:  # Capture first instance only
+            for website in matcher.match(result["link"]):
+                if rankings[website] is None:  # Capture first instance only
                     rankings[website] = index
 
     return rankings
@@ -46,67 +63,135 @@ def calculate_pixel_rank(rank):
         return None
     return 100 + (rank - 1) * 60  # Assuming each result occupies 60 pixels
 
-# Streamlit UI
-st.title("🎯 Mobile Google SERP Crawler and Pixel Rank Calculator (SerpAPI)")
-st.markdown("""
-<style>
-    .reportview-container {
-        background: #f0f0f0;
-        color: #333333;
-    }
-    .sidebar .sidebar-content {
-        background: #f7f7f7;
-    }
-</style>
-""", unsafe_allow_html=True)
-
-# Step 1: API Key (entered directly in the code for local use)
-api_key = st.text_input("Enter your SerpAPI Key", type="password")
-
-# Step 2: File Upload
-uploaded_file = st.file_uploader("Upload a CSV file with keywords", type=["csv"])
+# Function to fetch rankings for every keyword concurrently and build the results table
+# on_progress(done, total) is called as keywords complete; rows keep the input order
+def collect_rankings(keywords, competitors_list, primary_website, engine, key_pool, cache, max_workers, on_progress=None):
+    # Initialize empty list to store results
+    serp_data = []
+    failed_keywords = []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(get_serp_rank_serpapi, keyword, competitors_list, engine, key_pool, cache)
+            for keyword in keywords
+        ]
+        for done, (keyword, future) in enumerate(zip(keywords, futures), 1):
+            rankings = future.result()
+            if rankings is None:
+                failed_keywords.append(str(keyword))
+                rankings = {website: None for website in competitors_list}
+            if on_progress:
+                on_progress(done, len(keywords))
 
-# Step 3: Input Competitors and Primary Website
-competitors = st.text_input("Enter Competitor Websites (comma-separated)", placeholder="e.g., collegedekho.com, collegedunia.com, shiksha.com")
-primary_website = st.text_input("Enter Primary Website", placeholder="e.g., yourwebsite.com")
-
-if api_key and uploaded_file and competitors and primary_website:
-    keywords_df = pd.read_csv(uploaded_file)
-
-    if 'Keyword' not in keywords_df.columns:
-        st.error("CSV file must contain 'Keyword' column")
-    else:
-        competitors_list = [primary_website] + [website.strip() for website in competitors.split(',')]
-
-        # Initialize empty list to store results
-        serp_data = []
-
-        st.markdown("### 📊 Fetching Rankings...")
-        
-        for keyword in keywords_df['Keyword']:
-            st.info(f"Fetching rankings for: **{keyword}**")
-            rankings = get_serp_rank_serpapi(keyword, competitors_list, api_key)
-            
             # Calculate pixel rank for primary website
             pixel_rank = calculate_pixel_rank(rankings[primary_website])
-            
+
             # Store the data for each keyword
             row = [keyword] + [rankings[website] for website in competitors_list] + [pixel_rank]
             serp_data.append(row)
 
-        # Create a DataFrame to display results
-        columns = ['Keyword'] + [f'Ranking of {website}' for website in competitors_list] + ['Pixel Rank (Primary Website)']
-        result_df = pd.DataFrame(serp_data, columns=columns)
-
-        # Apply styling to the table
-        def style_ranking(val):
-            color = 'green' if pd.notnull(val) and val <= 10 else 'red'
-            return f'color: {color}'
-        
-        st.markdown("### 🎯 SERP Rankings and Pixel Rank")
-        styled_df = result_df.style.applymap(style_ranking, subset=[f'Ranking of {website}' for website in competitors_list])
-        st.dataframe(styled_df)
-
-        # Option to download results
-        csv = result_df.to_csv(index=False)
-        st.download_button(label="📥 Download Results as CSV", data=csv, mime="text/csv")
+    # Create a DataFrame to display results
+    columns = ['Keyword'] + [f'Ranking of {website}' for website in competitors_list] + ['Pixel Rank (Primary Website)']
+    return pd.DataFrame(serp_data, columns=columns), failed_keywords
+
+# Background job entry point (see job_runner.JOB_TARGETS); runs without a Streamlit session
+def run_serpapi_job(job, keywords, competitors_list, primary_website, api_keys, max_workers, requests_per_second, cache_ttl_hours):
+    engine = FetchEngine(max_concurrency=max_workers, requests_per_second=requests_per_second)
+    key_pool = SerpApiKeyPool(api_keys)
+    key_pool.refresh(engine)
+    cache = open_cache().with_ttl(int(cache_ttl_hours) * 3600)
+    job.report_progress(0, len(keywords))
+    result_df, failed_keywords = collect_rankings(
+        keywords, competitors_list, primary_website, engine, key_pool, cache, max_workers, on_progress=job.report_progress
+    )
+    if failed_keywords:
+        job.report_progress(len(keywords), len(keywords), message=f"Could not fetch {len(failed_keywords)} keywords")
+    output_file = job.result_path("serp_rankings.csv")
+    result_df.to_csv(output_file, index=False)
+    return output_file
+
+# Streamlit UI
+def main():
+    st.title("🎯 Mobile Google SERP Crawler and Pixel Rank Calculator (SerpAPI)")
+    st.markdown("""
+    <style>
+        .reportview-container {
+            background: #f0f0f0;
+            color: #333333;
+        }
+        .sidebar .sidebar-content {
+            background: #f7f7f7;
+        }
+    </style>
+    """, unsafe_allow_html=True)
+
+    # Step 1: API Key(s) (entered directly in the code for local use); quota is tracked per key
+    api_key = st.text_input("Enter your SerpAPI Key (comma-separate several keys to spread the quota)", type="password")
+    api_keys = [key.strip() for key in api_key.split(',') if key.strip()]
+    max_workers = st.slider("Number of Parallel Requests", min_value=1, max_value=20, value=5)
+    # The request rate is limited separately from the number of parallel requests
+    requests_per_second = st.slider("Max Requests per Second", min_value=1, max_value=20, value=5)
+
+    # Cached SerpAPI responses are reused across reruns and runs until they expire
+    cache_ttl_hours = st.number_input("Reuse cached SERPs for (hours)", min_value=0, max_value=720, value=24)
+    cache = open_cache().with_ttl(int(cache_ttl_hours) * 3600)
+
+    # Step 2: File Upload
+    uploaded_file = st.file_uploader("Upload a CSV file with keywords", type=["csv"])
+
+    # Step 3: Input Competitors and Primary Website
+    competitors = st.text_input("Enter Competitor Websites (comma-separated)", placeholder="e.g., collegedekho.com, collegedunia.com, shiksha.com")
+    primary_website = st.text_input("Enter Primary Website", placeholder="e.g., yourwebsite.com")
+
+    # Large uploads can be queued in a background worker instead of holding this page open
+    run_mode = st.radio("Run mode", ("Run now", "Run in background"), horizontal=True)
+
+    if api_keys and uploaded_file and competitors and primary_website:
+        keywords_df = pd.read_csv(uploaded_file)
+
+        if 'Keyword' not in keywords_df.columns:
+            st.error("CSV file must contain 'Keyword' column")
+        else:
+            competitors_list = [primary_website] + [website.strip() for website in competitors.split(',')]
+            keywords = keywords_df['Keyword'].tolist()
+
+            if run_mode == "Run in background":
+                if st.button("Queue Job"):
+                    job_args = (keywords, competitors_list, primary_website, api_keys, max_workers, requests_per_second, cache_ttl_hours)
+                    submit_job("serpranking", job_args, description=f"{uploaded_file.name} ({len(keywords)} keywords)")
+                    st.success("Job queued. Track its progress below.")
+            else:
+                st.markdown("### 📊 Fetching Rankings...")
+                engine = get_fetch_engine()
+                engine.configure(max_workers, requests_per_second)
+                key_pool = SerpApiKeyPool(api_keys)
+                key_pool.refresh(engine)
+
+                progress_bar = st.progress(0.0, text=f"Fetched 0/{len(keywords)} keywords")
+                result_df, failed_keywords = collect_rankings(
+                    keywords, competitors_list, primary_website, engine, key_pool, cache, max_workers,
+                    on_progress=lambda done, total: progress_bar.progress(done / total, text=f"Fetched {done}/{total} keywords"),
+                )
+
+                if failed_keywords:
+                    st.warning(f"Could not fetch {len(failed_keywords)} keywords: {', '.join(failed_keywords[:20])}")
+                st.write("SerpAPI usage for this run:")
+                st.table(pd.DataFrame(key_pool.summary()))
+
+                # Apply styling to the table
+                def style_ranking(val):
+                    color = 'green' if pd.notnull(val) and val <= 10 else 'red'
+                    return f'color: {color}'
+
+                st.markdown("### 🎯 SERP Rankings and Pixel Rank")
+                styled_df = result_df.style.map(style_ranking, subset=[f'Ranking of {website}' for website in competitors_list])
+                st.dataframe(styled_df)
+
+                # Option to download results
+                csv = result_df.to_csv(index=False)
+                st.download_button(label="📥 Download Results as CSV", data=csv, mime="text/csv")
+
+    show_jobs("serpranking")
+
+if __name__ == "__main__":
+    main()
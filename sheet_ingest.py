@@ -0,0 +1,177 @@
+import hashlib
+import os
+import pickle
+from io import BytesIO
+
+import openpyxl
+import pandas as pd
+
+STREAM_CHUNK_ROWS = 5000  # Rows per chunk in streaming mode
+SHEET_STORE_DIR = os.path.join(".cache", "sheet_store")
+SHEET_STORE_MAX_FILES = 200  # Parsed sheets kept on disk; the least recently stored are dropped first
+
+
+# Function to normalize parsed column names (strip and lowercase)
+def normalize_columns(df):
+    df.columns = df.columns.astype(str).str.strip().str.lower()
+    return df
+
+
+# Function to name header cells the way pd.read_excel does, then normalize them like the full parse
+# (blank cells become "Unnamed: <n>", repeated names get ".1", ".2", ... suffixes)
+def normalize_headers(header_row):
+    headers = []
+    seen = {}
+    for i, header in enumerate(header_row):
+        name = f"Unnamed: {i}" if header is None else str(header)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        headers.append(name.strip().lower())
+    return headers
+
+
+# Function to stream a sheet row by row with openpyxl's read-only mode
+# Returns the normalized headers (from the second row) and a generator of DataFrame chunks
+# holding only the requested columns, with all-blank rows dropped on the fly
+def stream_selected_sheet(file_bytes, sheet_name, selected_headers=None, chunk_rows=STREAM_CHUNK_ROWS):
+    workbook = openpyxl.load_workbook(BytesIO(file_bytes), read_only=True, data_only=True)
+    try:
+        rows = workbook[sheet_name].iter_rows(values_only=True)
+        next(rows, None)  # Skip the first row; the header starts from the second row
+        headers = normalize_headers(next(rows, None) or ())
+    except Exception:
+        workbook.close()
+        raise
+
+    # Project the selected columns (first occurrence of each header), or keep all of them
+    wanted = None if selected_headers is None else {header.lower() for header in selected_headers if isinstance(header, str)}
+    positions = [i for i, header in enumerate(headers) if wanted is None or header in wanted]
+    columns = [headers[i] for i in positions]
+
+    def chunks():
+        try:
+            if not positions:
+                return
+            chunk = []
+            for row in rows:
+                values = [row[i] if i < len(row) else None for i in positions]
+                if all(value is None for value in values):
+                    continue
+                chunk.append(values)
+                if len(chunk) >= chunk_rows:
+                    yield pd.DataFrame(chunk, columns=columns)
+                    chunk = []
+            if chunk:
+                yield pd.DataFrame(chunk, columns=columns)
+        finally:
+            workbook.close()
+
+    return columns, chunks()
+
+
+# Function to get the store file of one parsed sheet, keyed by the upload's content hash and the sheet name
+def sheet_store_path(content_hash, sheet_name):
+    sheet_hash = hashlib.sha256(sheet_name.encode("utf-8")).hexdigest()
+    return os.path.join(SHEET_STORE_DIR, f"{content_hash[:16]}_{sheet_hash[:12]}.pkl")
+
+
+# Function to drop the oldest files of a cache directory once it holds more than max_files (temporary files are kept)
+def prune_directory(directory, max_files):
+    stored = [os.path.join(directory, name) for name in os.listdir(directory) if not name.endswith(".tmp")]
+    if len(stored) <= max_files:
+        return
+    for path in sorted(stored, key=os.path.getmtime)[:len(stored) - max_files]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+# Function to parse one sheet of an upload into the shared sheet store, once per (content hash, sheet name)
+# Only the requested sheet is parsed. Runs in worker processes (or inline), so instead of calling Streamlit
+# it returns [(level, message), ...]; a stored sheet is read back with load_stored_sheet
+def store_sheet(file_name, content_hash, file_bytes, sheet_name):
+    path = sheet_store_path(content_hash, sheet_name)
+    if os.path.exists(path):
+        return []
+    try:
+        # Header starts from the second row
+        df = normalize_columns(pd.read_excel(BytesIO(file_bytes), sheet_name=sheet_name, header=1))
+    except Exception as e:
+        return [("error", f"Error processing file: {file_name} - {e}")]
+    os.makedirs(SHEET_STORE_DIR, exist_ok=True)
+    tmp_file = f"{path}.{os.getpid()}.tmp"  # Per process, in case two sessions store the same sheet at once
+    df.to_pickle(tmp_file)
+    os.replace(tmp_file, path)
+    prune_directory(SHEET_STORE_DIR, SHEET_STORE_MAX_FILES)
+    return []
+
+
+# Function to read a parsed sheet from the store (None if it was not stored)
+def load_stored_sheet(content_hash, sheet_name):
+    path = sheet_store_path(content_hash, sheet_name)
+    if not os.path.exists(path):
+        return None
+    return pd.read_pickle(path)
+
+
+# Function to keep the selected columns of a parsed sheet, drop blank rows and tag the source file
+# Returns (frame or None, [(level, message), ...])
+def select_columns(df, file_name, sheet_name, selected_headers):
+    messages = [("success", f"Extracted '{sheet_name}' sheet from {file_name}")]
+    wanted_headers = [header.lower() for header in selected_headers if isinstance(header, str)]
+
+    # Debug: Check headers in each file
+    messages.append(("write", f"Headers in {file_name}: {df.columns.tolist()}"))
+
+    # Get the selected headers (ensure they exist in the current file's sheet and are valid strings)
+    available_headers = [col for col in df.columns if col in wanted_headers]
+    if not available_headers:
+        messages.append(("warning", f"No matching columns found in {file_name} for selected headers."))
+        return None, messages
+
+    # Filter the DataFrame to include only the selected headers
+    # Remove rows where all selected columns are blank
+    df_filtered = df[available_headers].dropna(how='all', subset=available_headers)
+
+    # Add a column for the file name
+    return df_filtered.assign(source_file=file_name), messages
+
+
+# Function to stream one upload's selected sheet into a part file, keeping only the selected columns
+# Each chunk is tagged with the source file and appended to part_path as soon as it is read, so the worker never
+# holds more than one chunk. Runs in worker processes, so instead of calling Streamlit it returns
+# (written columns or None, row count, [(level, message), ...]); read the part back with iter_part
+def stream_sheet_to_part(file_name, file_bytes, sheet_name, selected_headers, part_path):
+    try:
+        # Only the selected columns are read, and blank rows are already dropped
+        columns, chunks = stream_selected_sheet(file_bytes, sheet_name, selected_headers)
+        messages = [
+            ("success", f"Extracted '{sheet_name}' sheet from {file_name}"),
+            ("write", f"Headers in {file_name}: {columns}"),
+        ]
+        if not columns:
+            chunks.close()
+            messages.append(("warning", f"No matching columns found in {file_name} for selected headers."))
+            return None, 0, messages
+        rows = 0
+        with open(part_path, "wb") as part:
+            for chunk in chunks:
+                pickle.dump(chunk.assign(source_file=file_name), part, protocol=pickle.HIGHEST_PROTOCOL)
+                rows += len(chunk)
+    except Exception as e:
+        return None, 0, [("error", f"Error processing file: {file_name} - {e}")]
+    return columns + ['source_file'], rows, messages
+
+
+# Function to read the chunks of a part file back, one at a time
+def iter_part(part_path):
+    with open(part_path, "rb") as part:
+        while True:
+            try:
+                yield pickle.load(part)
+            except EOFError:
+                return
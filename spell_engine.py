@@ -0,0 +1,126 @@
+import os
+import re
+import sqlite3
+import string
+import threading
+
+import pandas as pd
+from spellchecker import SpellChecker
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "spell_cache.sqlite")
+LOOKUP_BATCH = 500  # Tokens per SQLite lookup (stays under SQLite's bound-parameter limit)
+
+
+# Function to convert text to proper case, ignoring abbreviations
+def proper_case_except_abbreviations(text):
+    def capitalize_word(word):
+        if word.isupper():  # Keep abbreviations in uppercase
+            return word
+        else:
+            return word.capitalize()  # Capitalize only non-abbreviation words
+    return ' '.join([capitalize_word(word) for word in re.split(r'(\W+)', text)])
+
+
+# Function to strip the punctuation around a token, keeping what the whitelist is matched against
+def token_core(token):
+    return token.strip(string.punctuation)
+
+
+# Function to collect the domain words the spell checker must leave alone:
+# every word of the college names (which carry the city names) and every acronym used in the template
+def build_domain_whitelist(df, name_column='College Name'):
+    whitelist = set()
+    for name in df[name_column].dropna().astype(str):
+        whitelist.update(word.lower() for word in re.findall(r"[A-Za-z]+", name))
+    for col in df.columns:
+        for text in df[col].dropna().unique():
+            if isinstance(text, str):
+                whitelist.update(word.lower() for word in re.findall(r"\b[A-Z]{2,}\b", text))
+    return frozenset(whitelist)
+
+
+# Spell correction done once per distinct token: known and whitelisted tokens are kept as they are,
+# and the corrections of the rest are remembered in SQLite across runs
+class SpellEngine:
+    def __init__(self, whitelist=frozenset(), cache_path=DEFAULT_CACHE_PATH):
+        if os.path.dirname(cache_path):
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        self.spell = SpellChecker()
+        self.whitelist = whitelist
+        self.memory = {}  # Token -> correction, for tokens already seen by this process
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(cache_path, timeout=30, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS corrections (token TEXT PRIMARY KEY, correction TEXT NOT NULL)")
+
+    # Function to tell whether a token needs no correction
+    def is_known(self, token):
+        core = token_core(token)
+        if not core or core.lower() in self.whitelist:
+            return True
+        # Numbers, codes and links are not words the dictionary could fix
+        if any(ch.isdigit() for ch in core) or "://" in core or core.startswith("www."):
+            return True
+        return token in self.spell
+
+    # Function to correct each distinct token once, returning token -> corrected token
+    def correct_tokens(self, tokens):
+        corrections = {}
+        unknown = []
+        for token in set(tokens):
+            if token in self.memory:
+                corrections[token] = self.memory[token]
+            elif self.is_known(token):
+                corrections[token] = token
+            else:
+                unknown.append(token)
+
+        # Tokens corrected in earlier runs come from the persistent cache
+        with self.lock:
+            for start in range(0, len(unknown), LOOKUP_BATCH):
+                batch = unknown[start:start + LOOKUP_BATCH]
+                rows = self.conn.execute(
+                    f"SELECT token, correction FROM corrections WHERE token IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                corrections.update(rows)
+
+        missing = [token for token in unknown if token not in corrections]
+        new_rows = [(token, self.spell.correction(token) or token) for token in missing]  # None when no candidate is found
+        if new_rows:
+            with self.lock, self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO corrections (token, correction) VALUES (?, ?)", new_rows)
+        corrections.update(new_rows)
+
+        with self.lock:
+            self.memory.update((token, corrections[token]) for token in unknown)
+        return corrections
+
+    # Function to correct a Series of texts: split into tokens, correct the distinct tokens, then rejoin per text
+    def correct_series(self, texts):
+        texts = pd.Series(list(texts), dtype=object)
+        tokens = texts.str.split().explode().dropna()
+        corrections = self.correct_tokens(tokens.unique())
+        rejoined = tokens.map(corrections).groupby(level=0, sort=False).agg(' '.join)
+        corrected = rejoined.reindex(texts.index, fill_value='')
+        # Texts repeat across rows, so proper-case each distinct corrected text once
+        return corrected.map({text: proper_case_except_abbreviations(text) for text in corrected.unique()})
+
+    # Function to correct every text cell of a DataFrame, leaving other cells untouched
+    def correct_frame(self, df):
+        corrected_df = df.astype(object)
+        cells = [
+            (j, i, value)
+            for j in range(corrected_df.shape[1])
+            for i, value in enumerate(corrected_df.iloc[:, j].tolist())
+            if isinstance(value, str)
+        ]
+        if not cells:
+            return corrected_df
+        corrected = self.correct_series(value for _, _, value in cells).tolist()
+        columns = {}  # Column position -> values with the corrections filled in
+        for (j, i, _), value in zip(cells, corrected):
+            columns.setdefault(j, corrected_df.iloc[:, j].tolist())[i] = value
+        for j, values in columns.items():
+            corrected_df.isetitem(j, values)
+        return corrected_df
@@ -0,0 +1,229 @@
+import argparse
+import contextlib
+import csv
+import hashlib
+import json
+import os
+import time
+
+import pandas as pd
+
+from name_matching import DEFAULT_TOP_K, NameMatcher
+
+STREAM_DIR = os.path.join(".cache", "mapper")
+DEFAULT_CHUNK_ROWS = 50_000  # Rows of list A read, matched and written per chunk
+RESULT_COLUMNS = ['Matched Name', 'Match Score', 'TF-IDF Similarity', 'Matched']
+
+
+# Function to hash a college list, so a run can tell whether it was started against the same list B
+def list_hash(college_list):
+    return hashlib.sha256("\x1f".join(str(name) for name in college_list).encode("utf-8")).hexdigest()
+
+
+# Function to read the CSV records of a binary file from its current position, one at a time
+# Yields (record, byte offset just after it); quoted fields may span lines, and blank lines are skipped
+def iter_records(f):
+    def lines():
+        while line := f.readline():
+            yield line.decode("utf-8")
+
+    for record in csv.reader(lines()):
+        # The reader pulls lines only as a record needs them, so the file position is the record's end
+        if record:
+            yield record, f.tell()
+
+
+def checkpoint_path(output_path):
+    return f"{output_path}.checkpoint.json"
+
+
+def read_checkpoint(output_path):
+    if not os.path.exists(checkpoint_path(output_path)):
+        return None
+    with open(checkpoint_path(output_path)) as f:
+        return json.load(f)
+
+
+# Function to record the chunks written so far; written atomically so a crash never leaves half a checkpoint
+def write_checkpoint(output_path, checkpoint):
+    tmp_file = f"{checkpoint_path(output_path)}.{os.getpid()}.tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_file, checkpoint_path(output_path))
+
+
+# Function to tell whether a process is still running
+def is_process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# Function to hold an exclusive lock on an output file while it is written, so two runs never interleave their writes
+# A lock left behind by a process that no longer runs is taken over; a live holder raises RuntimeError
+@contextlib.contextmanager
+def output_lock(output_path):
+    lock_path = f"{output_path}.lock"
+    if os.path.dirname(lock_path):
+        os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    for _ in range(2):
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                with open(lock_path) as f:
+                    holder = int(f.read() or 0)
+            except (FileNotFoundError, ValueError):
+                holder = 0
+            if not holder or is_process_alive(holder):
+                raise RuntimeError(f"{output_path} is already being written by another run (lock file {lock_path})")
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(lock_path)
+    else:
+        raise RuntimeError(f"Could not lock {output_path}")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(str(os.getpid()))
+        yield
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(lock_path)
+
+
+# Function to map a CSV of any size against a prebuilt list-B matcher, chunk by chunk
+# Each matched chunk is appended to output_path and checkpointed with the input byte offset it ends at; running again
+# with the same inputs seeks straight past the written chunks. on_progress(rows done, bytes done, total bytes)
+# is called after every chunk. Only one run at a time may write an output file
+def map_csv_stream(input_path, column, matcher, output_path, chunk_rows=DEFAULT_CHUNK_ROWS,
+                   top_k=DEFAULT_TOP_K, min_score=0, on_progress=None, restart=False):
+    with output_lock(output_path):
+        return _map_csv_stream(input_path, column, matcher, output_path, chunk_rows, top_k, min_score, on_progress, restart)
+
+
+def _map_csv_stream(input_path, column, matcher, output_path, chunk_rows, top_k, min_score, on_progress, restart):
+    stat = os.stat(input_path)
+    signature = {
+        "input_size": stat.st_size,
+        "input_mtime_ns": stat.st_mtime_ns,
+        "column": column,
+        "list_hash": list_hash(matcher.names),
+        "top_k": top_k,
+        "min_score": min_score,
+    }
+    checkpoint = None if restart else read_checkpoint(output_path)
+    if (checkpoint is None or checkpoint["signature"] != signature or not os.path.exists(output_path)
+            or os.path.getsize(output_path) < checkpoint["output_bytes"]):
+        checkpoint = {"signature": signature, "input_offset": 0, "rows_done": 0, "output_bytes": 0, "complete": False}
+    if checkpoint["complete"]:
+        if on_progress:
+            on_progress(checkpoint["rows_done"], stat.st_size, stat.st_size)
+        return checkpoint["rows_done"]
+
+    if os.path.dirname(output_path):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    # Drop whatever a crashed run wrote after its last checkpoint
+    with open(output_path, "ab") as f:
+        f.truncate(checkpoint["output_bytes"])
+
+    # Column names as pandas reads them (duplicates get ".1", ".2", ... suffixes)
+    columns = pd.read_csv(input_path, nrows=0).columns.tolist()
+    with open(input_path, "rb") as f, open(output_path, "a", newline="", encoding="utf-8") as out:
+        if checkpoint["input_offset"]:
+            f.seek(checkpoint["input_offset"])  # Written by an earlier run
+        else:
+            f.seek(3 if f.read(3) == b"\xef\xbb\xbf" else 0)  # Skip a UTF-8 byte order mark
+            next(iter_records(f), None)  # Header
+        records = iter_records(f)
+        while True:
+            chunk = []
+            offset = None
+            for record, offset in records:
+                if len(record) > len(columns):
+                    raise ValueError(f"Expected {len(columns)} fields, saw {len(record)} in the row ending at byte {offset}")
+                # Values pass through as text, so every chunk is written the way it was read
+                chunk.append(record + [""] * (len(columns) - len(record)))
+                if len(chunk) >= chunk_rows:
+                    break
+            if not chunk:
+                break
+            chunk = pd.DataFrame(chunk, columns=columns, dtype=str)
+            rows = [
+                (matcher.names[index] if index is not None else None, score, round(similarity, 4),
+                 index is not None and score >= min_score)
+                for index, score, similarity in matcher.iter_matches(chunk[column].tolist(), k=top_k)
+            ]
+            chunk[RESULT_COLUMNS] = pd.DataFrame(rows, columns=RESULT_COLUMNS, index=chunk.index)
+            chunk.to_csv(out, header=checkpoint["output_bytes"] == 0, index=False)
+            out.flush()
+            os.fsync(out.fileno())
+            checkpoint.update(
+                input_offset=offset,
+                rows_done=checkpoint["rows_done"] + len(chunk),
+                output_bytes=out.tell(),
+            )
+            write_checkpoint(output_path, checkpoint)
+            if on_progress:
+                on_progress(checkpoint["rows_done"], offset, stat.st_size)
+    checkpoint["complete"] = True
+    write_checkpoint(output_path, checkpoint)
+    return checkpoint["rows_done"]
+
+
+# Function to get the output file of a run; the same inputs always map to the same file, so a rerun resumes it
+def stream_output_path(input_path, column, college_list, top_k, min_score):
+    key = hashlib.sha256(
+        json.dumps([os.path.abspath(input_path), column, list_hash(college_list), top_k, min_score]).encode("utf-8")
+    ).hexdigest()
+    return os.path.join(STREAM_DIR, f"mapped_{key[:16]}.csv")
+
+
+# Background job: streams list A against list B and returns the mapped CSV
+def run_mapping_job(job, input_path, column, college_list, top_k=DEFAULT_TOP_K, min_score=0):
+    job.report_progress(0, None, message="Indexing the college list...")
+    matcher = NameMatcher(college_list)
+    output_path = stream_output_path(input_path, column, college_list, top_k, min_score)
+    started = time.time()
+
+    # Progress is measured in bytes of list A, which is known without counting its rows first
+    def report(rows_done, bytes_done, total_bytes):
+        job.report_progress(bytes_done, total_bytes, message=(
+            f"Mapped {rows_done} names ({bytes_done / max(total_bytes, 1):.0%} of the file, {time.time() - started:.0f}s)"
+        ))
+
+    map_csv_stream(input_path, column, matcher, output_path, top_k=top_k, min_score=min_score, on_progress=report)
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Map the names of a very large CSV (list A) to a college list (list B) in chunks.")
+    parser.add_argument("list_a", help="CSV with the names to map")
+    parser.add_argument("list_b", help="CSV with the colleges to map them to")
+    parser.add_argument("--column-a", required=True, help="College name column in list A")
+    parser.add_argument("--column-b", required=True, help="College name column in list B")
+    parser.add_argument("--output", required=True, help="Mapped CSV to write (resumed if a checkpoint exists)")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="Rows of list A per chunk")
+    parser.add_argument("--top-k", type=int, default=DEFAULT_TOP_K, help="Candidates re-scored per name")
+    parser.add_argument("--min-score", type=int, default=80, help="Minimum match score")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start over")
+    args = parser.parse_args()
+
+    college_list = pd.read_csv(args.list_b, usecols=[args.column_b])[args.column_b].dropna().astype(str).tolist()
+    matcher = NameMatcher(college_list)
+    started = time.time()
+    rows = map_csv_stream(
+        args.list_a, args.column_a, matcher, args.output, args.chunk_rows, args.top_k, args.min_score,
+        on_progress=lambda rows_done, bytes_done, total_bytes: print(
+            f"Mapped {rows_done} names ({bytes_done / max(total_bytes, 1):.0%} of the file, {time.time() - started:.0f}s)", flush=True
+        ),
+        restart=args.restart,
+    )
+    print(f"Wrote {rows} rows to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
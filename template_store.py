@@ -0,0 +1,90 @@
+import hashlib
+import os
+
+import pandas as pd
+import pyarrow.feather as feather
+import requests
+
+TEMPLATE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ALL_CCM_ALL_Template.xlsx")
+TEMPLATE_URL = "https://raw.githubusercontent.com/nishit002/dekho-codes/main/ALL_CCM_ALL_Template.xlsx"
+CACHE_DIR = os.path.join(".cache", "template_store")
+CACHE_FORMAT_VERSION = 1  # Bump when prepare_template changes, so old caches are rebuilt
+CATEGORY_MAX_UNIQUE_RATIO = 0.5  # Text columns with fewer distinct values than this share of rows become categorical
+
+
+# Function to hash a file's content in blocks
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Function to find the template workbook: the copy bundled with the repo, else a previously
+# downloaded copy, else download it once (the only case that needs the network)
+def locate_template():
+    if os.path.exists(TEMPLATE_FILE):
+        return TEMPLATE_FILE
+    downloaded_file = os.path.join(CACHE_DIR, os.path.basename(TEMPLATE_FILE))
+    if not os.path.exists(downloaded_file):
+        response = requests.get(TEMPLATE_URL, timeout=30)
+        response.raise_for_status()
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_file = f"{downloaded_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "wb") as f:
+            f.write(response.content)
+        os.replace(tmp_file, downloaded_file)
+    return downloaded_file
+
+
+# Function to get the content hash of the current template, which identifies its version
+def template_hash():
+    return file_sha256(locate_template())
+
+
+# Function to add the derived columns and shrink the dtypes of the parsed template
+def prepare_template(df):
+    df['College Name'] = df.iloc[:, 0].astype(str)
+    df = df.dropna(subset=['College Name'])
+    df['Filled Fields Count'] = (df.notna().sum(axis=1) - 1).astype("int16")  # Exclude the college name column
+
+    for col in df.columns:
+        if col in ('College Name', 'Filled Fields Count'):
+            continue
+        values = df[col]
+        if values.isna().all():
+            df[col] = values.astype("float32")
+            continue
+        if pd.api.types.is_numeric_dtype(values):
+            continue
+        # Cells mixing text and numbers are stored as their text, as the page shows them
+        values = values.where(values.isna(), values.astype(str))
+        if values.nunique() < CATEGORY_MAX_UNIQUE_RATIO * values.notna().sum():
+            df[col] = values.astype("category")
+        else:
+            df[col] = values.astype("string")
+    return df.reset_index(drop=True)
+
+
+# Function to load the template, converting the workbook into a Feather cache once per content hash
+# Loading the uncompressed cache is a plain columnar read: no Excel parsing and no decompression
+def load_template():
+    content_hash = template_hash()
+    cache_file = os.path.join(CACHE_DIR, f"template_v{CACHE_FORMAT_VERSION}_{content_hash[:16]}.feather")
+
+    if not os.path.exists(cache_file):
+        df = prepare_template(pd.read_excel(locate_template(), header=0))
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"  # Per process, in case two apps build the cache at once
+        feather.write_feather(df, tmp_file, compression="uncompressed")
+        os.replace(tmp_file, cache_file)
+        # Drop caches of earlier versions of the workbook
+        for file_name in os.listdir(CACHE_DIR):
+            if file_name.endswith(".feather") and os.path.join(CACHE_DIR, file_name) != cache_file:
+                try:
+                    os.remove(os.path.join(CACHE_DIR, file_name))
+                except FileNotFoundError:
+                    pass
+
+    return feather.read_table(cache_file, memory_map=True).to_pandas()
@@ -0,0 +1,30 @@
+import pandas as pd
+
+from josaa_store import KEY_COLUMNS, select
+
+
+def make_store():
+    rows = [
+        (1, 'CSE', 'HS', 'OPEN', 'Gender-Neutral', 100),
+        (1, 'CSE', 'HS', 'OPEN', 'Female-only', 200),
+        (1, 'CSE', 'HS', 'OPEN (PwD)', 'Gender-Neutral', 300),
+    ]
+    df = pd.DataFrame(rows, columns=KEY_COLUMNS + ['Closing Rank'])
+    return df.set_index(KEY_COLUMNS).sort_index()
+
+
+def test_select_full_key_returns_frame():
+    result = select(make_store(), 1, 'CSE', 'HS', 'OPEN', 'Female-only')
+    assert isinstance(result, pd.DataFrame)
+    assert result['Closing Rank'].tolist() == [200]
+
+
+def test_select_missing_value_returns_no_rows():
+    assert select(make_store(), 1, quota='AI').empty
+
+
+def test_select_missing_combination_returns_no_rows():
+    # Every value exists in its level, but no row has this combination
+    result = select(make_store(), 1, None, 'HS', 'OPEN (PwD)', 'Female-only')
+    assert result.empty
+    assert result.index.names == KEY_COLUMNS